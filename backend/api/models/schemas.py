@@ -2,9 +2,10 @@
 """
 API 数据模型定义 - 简化版（无RAG增强）
 
-本模块使用 Pydantic 定义 API 的请求和响应数据模型。
-Pydantic 提供运行时数据验证和自动生成 JSON Schema，
-使得 FastAPI 能够自动校验请求参数并生成 Swagger 文档。
+本模块定义 API 的请求和响应数据模型：
+- 请求模型（AlertData）使用 msgspec.Struct：由 C 实现的解码器一次完成 JSON 解析和字段校验，
+  速度远快于 Pydantic，路由层通过 backend.api.body_parser 手动解码请求体
+- 响应模型使用 Pydantic：仅用于生成 Swagger 文档中的响应结构
 
 模型层级关系：
   AlertData（请求） → 后端处理 → AnalysisResult（响应）
@@ -16,15 +17,20 @@ Pydantic 提供运行时数据验证和自动生成 JSON Schema，
   - AnalysisHistory: 历史记录列表项
   - SystemStats: 系统统计信息
 """
-from typing import List, Optional, Dict, Any
+from typing import Annotated, List, Literal, Optional, Dict, Any
+import msgspec
 from pydantic import BaseModel, Field
 
 
-class AlertData(BaseModel):
+# 威胁等级取值（专家智能体按风险评分映射：>=7 高危，>=4 中危，其余低危）
+ThreatLevel = Literal["高危", "中危", "低危"]
+
+
+class AlertData(msgspec.Struct):
     """告警输入数据模型 - 对应前端提交的告警表单
     
     定义了前端发送分析请求时必须和可选提供的字段。
-    使用 Pydantic 的 Field 进行字段描述和默认值设置。
+    使用 msgspec.Meta 进行字段描述，未提供默认值的字段为必填。
     
     Attributes:
         attack_type: 攻击类型描述（必填），如 "SQL注入"、"XSS攻击"
@@ -32,26 +38,29 @@ class AlertData(BaseModel):
         source_ip: 攻击来源 IP 地址（可选，默认 "0.0.0.0"）
         dest_ip: 攻击目标 IP 地址（可选，默认 "0.0.0.0"）
         protocol: 网络协议类型（可选，默认 "HTTP"）
-        additional_info: 附加信息字典（可选），存放自定义扩展数据
+        additional_info: 附加信息（可选），存放自定义扩展数据，原样透传
     """
-    attack_type: str = Field(..., description="攻击类型")                     # ... 表示必填字段
-    payload: str = Field(..., description="攻击载荷")
-    source_ip: str = Field("0.0.0.0", description="源IP地址")
-    dest_ip: str = Field("0.0.0.0", description="目标IP地址")
-    protocol: Optional[str] = Field("HTTP", description="协议类型")
-    additional_info: Optional[Dict[str, Any]] = Field(None, description="附加信息")
-
-    class Config:
-        """Pydantic 模型配置 - 提供 Swagger 文档中的请求示例"""
-        json_schema_extra = {
-            "example": {
-                "attack_type": "SQL注入",
-                "payload": "SELECT * FROM users WHERE id='1' UNION SELECT username, password FROM admin--",
-                "source_ip": "192.168.1.100",
-                "dest_ip": "10.0.0.5",
-                "protocol": "HTTP"
-            }
-        }
+    attack_type: Annotated[str, msgspec.Meta(description="攻击类型")]
+    payload: Annotated[str, msgspec.Meta(description="攻击载荷")]
+    source_ip: Annotated[str, msgspec.Meta(description="源IP地址")] = "0.0.0.0"
+    dest_ip: Annotated[str, msgspec.Meta(description="目标IP地址")] = "0.0.0.0"
+    protocol: Annotated[Optional[str], msgspec.Meta(description="协议类型")] = "HTTP"
+    # 附加信息只原样转发给智能体系统，声明为 Any 使解码器不校验其内部结构
+    additional_info: Annotated[Any, msgspec.Meta(description="附加信息")] = None
+
+
+# 模块级解码器：导入时构建一次，所有请求复用
+ALERT_DATA_DECODER = msgspec.json.Decoder(AlertData)
+
+
+# Swagger 文档中的请求示例
+ALERT_DATA_EXAMPLE = {
+    "attack_type": "SQL注入",
+    "payload": "SELECT * FROM users WHERE id='1' UNION SELECT username, password FROM admin--",
+    "source_ip": "192.168.1.100",
+    "dest_ip": "10.0.0.5",
+    "protocol": "HTTP"
+}
 
 
 class RoutingInfo(BaseModel):
@@ -77,7 +86,7 @@ class ExpertAnalysis(BaseModel):
     """
     attack_technique: str
     risk_score: float
-    threat_level: str
+    threat_level: ThreatLevel
     recommendations: List[str]
     analysis: str
 
@@ -134,7 +143,7 @@ class AnalysisHistory(BaseModel):
     """
     analysis_id: str
     attack_type: str
-    threat_level: str
+    threat_level: ThreatLevel
     risk_score: float
     timestamp: float
 
@@ -1,5 +1,15 @@
 # API routes module
+from fastapi import APIRouter
+
 from .analysis import router as analysis_router
 from .stats import router as stats_router
+from .rag import router as rag_router
+
+# 顶层路由：汇总所有子路由，应用只需挂载这一个
+# 各子路由自带前缀（/api、/api/rag），这里不再额外添加前缀
+api_router = APIRouter()
+api_router.include_router(analysis_router)     # /api/analyze, /api/history
+api_router.include_router(stats_router)        # /api/stats, /api/health
+api_router.include_router(rag_router)          # /api/rag/upload, /api/rag/query, /api/rag/clear, /api/rag/stats
 
-__all__ = ['analysis_router', 'stats_router']
+__all__ = ['api_router', 'analysis_router', 'stats_router', 'rag_router']
@@ -8,48 +8,58 @@
 
 所有路由都挂载在 /api 前缀下，由 FastAPI 的 APIRouter 管理。
 """
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import ORJSONResponse
 from typing import Optional, List, Dict, Any
 from loguru import logger
 
-from backend.api.models.schemas import AlertData, AnalysisResult, AnalysisHistory
-from backend.services.agent_service import get_agent_service
+from backend.api.models.schemas import AlertData, ALERT_DATA_DECODER, ALERT_DATA_EXAMPLE, AnalysisResult, AnalysisHistory
+from backend.api.body_parser import parse_json_body, json_body_openapi
+from backend.services.agent_service import agent_service
 
 # 创建路由器实例，设置 URL 前缀和 Swagger 文档标签
 router = APIRouter(prefix="/api", tags=["Analysis"])
 
 
-@router.post("/analyze", response_model=AnalysisResult)
-async def analyze_alert(alert_data: AlertData):
+# 不声明 response_model：结果已由服务层构建完成，避免 FastAPI 对响应再做一次 Pydantic 校验
+# 通过 responses 参数保留 Swagger 文档中的响应结构说明
+@router.post(
+    "/analyze",
+    responses={200: {"model": AnalysisResult}},
+    openapi_extra=json_body_openapi(AlertData, example=ALERT_DATA_EXAMPLE)
+)
+async def analyze_alert(request: Request):
     """分析安全告警（POST /api/analyze）
 
     接收前端提交的告警数据，调用多智能体系统进行智能分析。
     
     处理流程：
-    1. 接收并验证请求数据（Pydantic 自动完成）
-    2. 获取智能体服务单例
-    3. 调用异步分析方法（路由决策 → 专家分析）
-    4. 返回完整的分析结果
+    1. 读取原始请求体，用 msgspec 直接解码为 AlertData 并验证
+    2. 调用全局智能体服务的异步分析方法（路由决策 → 专家分析）
+    3. 返回完整的分析结果
     
     Args:
-        alert_data: 经 Pydantic 验证的告警数据（AlertData 模型）
+        request: 原始请求对象，请求体为 AlertData 格式的 JSON
         
     Returns:
-        AnalysisResult: 完整的分析结果，包含路由信息、专家分析和性能指标
+        ORJSONResponse: 完整的分析结果（结构同 AnalysisResult），包含路由信息、专家分析和性能指标
         
     Raises:
+        RequestValidationError(422): 请求体格式错误或字段校验失败
         HTTPException(500): 分析过程中发生异常时返回服务器错误
     """
+    # 在 try 之外解析请求体，确保校验错误以 422 返回而不是被转换为 500
+    alert_data = await parse_json_body(request, ALERT_DATA_DECODER)
+
     try:
         logger.info(f"收到分析请求: {alert_data.attack_type}")
 
-        # 获取全局智能体服务实例（单例模式）
-        service = get_agent_service()
         # 调用异步分析方法，内部会执行：路由决策 → 专家分析 → 结果综合
-        result = await service.analyze_alert(alert_data)
+        result = await agent_service.analyze_alert(alert_data)
 
         logger.info(f"分析完成: {alert_data.attack_type}")
-        return result
+        # 服务层返回的是普通字典，直接交给 orjson 序列化，跳过 jsonable_encoder
+        return ORJSONResponse(result)
 
     except Exception as e:
         logger.error(f"分析失败: {e}")
@@ -57,8 +67,10 @@ async def analyze_alert(alert_data: AlertData):
         raise HTTPException(status_code=500, detail=f"分析失败: {str(e)}")
 
 
-@router.get("/history", response_model=List[AnalysisHistory])
-async def get_analysis_history(
+# 同步路由：存储层查询是纯 CPU 操作，声明为 def 后由 Starlette 放到线程池执行，
+# 不会阻塞事件循环上正在进行的分析请求
+@router.get("/history", responses={200: {"model": List[AnalysisHistory]}})
+def get_analysis_history(
     limit: int = 50,
     offset: int = 0,
     threat_level: Optional[str] = None,
@@ -79,15 +91,14 @@ async def get_analysis_history(
     - end_time: 结束时间戳过滤
     
     Returns:
-        List[AnalysisHistory]: 符合条件的历史记录列表
+        ORJSONResponse: 符合条件的历史记录列表（结构同 List[AnalysisHistory]）
         
     Raises:
         HTTPException(500): 查询失败时返回服务器错误
     """
     try:
-        service = get_agent_service()
         # 将查询参数传递给存储层进行过滤
-        history = service.get_analysis_history(
+        history = agent_service.get_analysis_history(
             limit=limit,
             offset=offset,
             threat_level=threat_level,
@@ -95,7 +106,8 @@ async def get_analysis_history(
             start_time=start_time,
             end_time=end_time
         )
-        return history
+        # 存储层保存时已构建好列表项（summary），直接交给 orjson 序列化，不做逐条校验
+        return ORJSONResponse([record['summary'] for record in history])
 
     except Exception as e:
         logger.error(f"获取历史记录失败: {e}")
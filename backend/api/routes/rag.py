@@ -3,27 +3,36 @@
 RAG API 路由（RAG Routes）
 
 提供 RAG 知识库的 RESTful API 端点：
-- POST /api/rag/upload  : 上传文档文本，分块入库
+- POST /api/rag/upload  : 上传文档文本，分块入库（支持 JSON 和 NDJSON 流式上传）
 - POST /api/rag/query   : 提问，检索 + LLM 生成答案
+- POST /api/rag/query/stream : 流式问答，以 NDJSON 逐行返回检索结果和答案增量
 - DELETE /api/rag/clear : 清空知识库
 - GET /api/rag/stats    : 查看知识库统计信息
 """
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel, Field
-from typing import List, Dict, Any, Optional
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from typing import Annotated, AsyncIterator, List, Optional
+import msgspec
+import orjson
 from loguru import logger
 
 from backend.services.rag_service import get_rag_service
+from backend.api.body_parser import parse_json_body, json_body_openapi
 
 router = APIRouter(prefix="/api/rag", tags=["RAG"])
 
 
 # ==================== 请求/响应数据模型 ====================
+# 请求模型使用 msgspec.Struct（由 parse_json_body 解码校验），
+# 响应模型使用 Pydantic（仅用于 Swagger 文档）
 
-class UploadRequest(BaseModel):
+class UploadRequest(msgspec.Struct):
     """文档上传请求"""
-    texts: List[str] = Field(..., description="文档文本列表")
-    source_name: str = Field(default="用户上传", description="文档来源名称")
+    texts: Annotated[List[str], msgspec.Meta(description="文档文本列表")]
+    source_name: Annotated[str, msgspec.Meta(description="文档来源名称")] = "用户上传"
 
 
 class UploadResponse(BaseModel):
@@ -33,10 +42,21 @@ class UploadResponse(BaseModel):
     message: str
 
 
-class QueryRequest(BaseModel):
+class QueryRequest(msgspec.Struct):
     """问答请求"""
-    question: str = Field(..., description="用户问题", min_length=1)
-    top_k: int = Field(default=3, ge=1, le=10, description="检索文档块数量")
+    question: Annotated[str, msgspec.Meta(min_length=1, description="用户问题")]
+    top_k: Annotated[int, msgspec.Meta(ge=1, le=10, description="检索文档块数量")] = 3
+
+
+# 模块级解码器：导入时构建一次，所有请求复用
+_UPLOAD_DECODER = msgspec.json.Decoder(UploadRequest)
+_QUERY_DECODER = msgspec.json.Decoder(QueryRequest)
+
+# NDJSON 流式上传：每行一个 JSON 字符串，边接收边解码，每凑满一批就入库
+_NDJSON_MEDIA_TYPE = "application/x-ndjson"
+_UPLOAD_BATCH_SIZE = 64                              # 每批入库的文本数（对应一次批量 Embedding 调用）
+_NDJSON_MAX_LINE_BYTES = 8 * 1024 * 1024             # 单行（一段文本）的最大字节数，超出时拒绝请求
+_TEXT_DECODER = msgspec.json.Decoder(str)
 
 
 class SourceChunk(BaseModel):
@@ -60,18 +80,139 @@ class ClearResponse(BaseModel):
     message: str
 
 
+# ==================== NDJSON 流式上传 ====================
+
+class _NDJSONLineError(Exception):
+    """NDJSON 某一行无法解码（或超出长度上限）"""
+
+    def __init__(self, line_no: int, message: str):
+        super().__init__(message)
+        self.line_no = line_no
+        self.message = message
+
+
+def _decode_ndjson_line(line: bytearray, line_no: int) -> str:
+    """解码 NDJSON 的一行，失败时抛出 _NDJSONLineError（记录出错行号）"""
+    try:
+        return _TEXT_DECODER.decode(line)
+    except (msgspec.ValidationError, msgspec.DecodeError) as e:
+        raise _NDJSONLineError(line_no, str(e))
+
+
+async def _iter_ndjson_texts(request: Request) -> AsyncIterator[str]:
+    """逐块读取请求体，按行解码 NDJSON 文本
+
+    只缓存尚未遇到换行符的末尾片段，不会把整个请求体读入内存。
+    新数据追加到同一个 bytearray，换行符只在新到达的数据中查找，
+    单行很长时也不会反复复制、重复扫描已缓存的片段；
+    未完成的一行超过 _NDJSON_MAX_LINE_BYTES 时立即拒绝。
+
+    Args:
+        request: 请求体为 NDJSON 的请求对象
+
+    Yields:
+        str: 每一行解码出的文本（跳过空行）
+
+    Raises:
+        _NDJSONLineError: 某一行解码失败或超出长度上限
+    """
+    buffer = bytearray()
+    line_no = 0
+    async for chunk in request.stream():
+        scan_from = len(buffer)     # 之前缓存的片段中没有换行符，只需扫描新数据
+        buffer += chunk
+        line_start = 0
+        while (line_end := buffer.find(b"\n", scan_from)) != -1:
+            line_no += 1
+            line = buffer[line_start:line_end]
+            line_start = scan_from = line_end + 1
+            if line.strip():
+                yield _decode_ndjson_line(line, line_no)
+        del buffer[:line_start]
+        if len(buffer) > _NDJSON_MAX_LINE_BYTES:
+            raise _NDJSONLineError(line_no + 1, f"单行超过 {_NDJSON_MAX_LINE_BYTES} 字节上限")
+    if buffer.strip():
+        yield _decode_ndjson_line(buffer, line_no + 1)
+
+
+async def _upload_ndjson(request: Request, source_name: str) -> int:
+    """流式处理 NDJSON 上传，每 _UPLOAD_BATCH_SIZE 条文本入库一次
+
+    入库（Embedding 网络请求 + ChromaDB 写入）是阻塞操作，放到线程池执行，不阻塞事件循环。
+    之前的批次已经入库，中途某一行出错时无法回滚，
+    因此 422 错误中同时报告出错行号和此前已入库的文档块数量。
+
+    Returns:
+        int: 入库的文档块总数
+
+    Raises:
+        RequestValidationError: 某一行解码失败或超出长度上限（422）
+    """
+    rag = get_rag_service()
+    chunks_added = 0
+    batch: List[str] = []
+    try:
+        async for text in _iter_ndjson_texts(request):
+            batch.append(text)
+            if len(batch) == _UPLOAD_BATCH_SIZE:
+                chunks_added += await run_in_threadpool(rag.add_documents, batch, source_name=source_name)
+                batch = []
+    except _NDJSONLineError as e:
+        raise RequestValidationError([{
+            "type": "value_error",
+            "loc": ("body", e.line_no),
+            "msg": f"{e.message}（此前已入库 {chunks_added} 个文档块）",
+            "input": None,
+            "ctx": {"chunks_added": chunks_added},
+        }])
+    if batch:
+        chunks_added += await run_in_threadpool(rag.add_documents, batch, source_name=source_name)
+    return chunks_added
+
+
+# 在 Swagger 文档中同时声明 JSON 和 NDJSON 两种请求体
+_UPLOAD_OPENAPI = json_body_openapi(UploadRequest)
+_UPLOAD_OPENAPI["requestBody"]["content"][_NDJSON_MEDIA_TYPE] = {"schema": {"type": "string"}}
+
+
 # ==================== API 路由 ====================
+# 各路由不声明 response_model，直接序列化已构建好的响应对象，避免重复校验；
+# 响应结构通过 responses 参数保留在 Swagger 文档中
 
-@router.post("/upload", response_model=UploadResponse)
-async def upload_documents(request: UploadRequest):
+@router.post(
+    "/upload",
+    responses={200: {"model": UploadResponse}},
+    openapi_extra=_UPLOAD_OPENAPI
+)
+async def upload_documents(request: Request, source_name: str = "用户上传"):
     """上传文档文本到知识库（POST /api/rag/upload）
 
-    接收文本列表，自动分块并生成 Embedding 存入 ChromaDB。
+    接收文本列表，自动分块并生成 Embedding 存入 ChromaDB。支持两种请求体：
+    - application/json: 请求体直接由 msgspec 从原始字节解码为 UploadRequest
+    - application/x-ndjson: 每行一个 JSON 字符串，边接收边按批入库，
+      大文件上传时无需在内存中保留完整文本列表；来源名称通过 source_name 查询参数传入
     """
+    if request.headers.get("content-type", "").startswith(_NDJSON_MEDIA_TYPE):
+        try:
+            logger.info(f"收到 NDJSON 流式上传请求，来源: {source_name}")
+            chunks_added = await _upload_ndjson(request, source_name)
+        except RequestValidationError:
+            raise   # 行解码失败保持 422，不转换为 500
+        except Exception as e:
+            logger.error(f"文档上传失败: {e}")
+            raise HTTPException(status_code=500, detail=f"文档上传失败: {str(e)}")
+        return UploadResponse(
+            success=True,
+            chunks_added=chunks_added,
+            message=f"成功入库 {chunks_added} 个文档块"
+        )
+
+    upload = await parse_json_body(request, _UPLOAD_DECODER)
     try:
-        logger.info(f"收到文档上传请求，共 {len(request.texts)} 段文本，来源: {request.source_name}")
+        logger.info(f"收到文档上传请求，共 {len(upload.texts)} 段文本，来源: {upload.source_name}")
         rag = get_rag_service()
-        chunks_added = rag.add_documents(request.texts, source_name=request.source_name)
+        # 入库是阻塞操作（Embedding 网络请求 + ChromaDB 写入），放到线程池执行
+        chunks_added = await run_in_threadpool(rag.add_documents, upload.texts, source_name=upload.source_name)
         return UploadResponse(
             success=True,
             chunks_added=chunks_added,
@@ -82,16 +223,22 @@ async def upload_documents(request: UploadRequest):
         raise HTTPException(status_code=500, detail=f"文档上传失败: {str(e)}")
 
 
-@router.post("/query", response_model=QueryResponse)
-async def query_rag(request: QueryRequest):
+@router.post(
+    "/query",
+    responses={200: {"model": QueryResponse}},
+    openapi_extra=json_body_openapi(QueryRequest)
+)
+async def query_rag(request: Request):
     """知识库问答（POST /api/rag/query）
 
     检索最相关文档块，调用 LLM 生成基于文档的答案。
+    请求体直接由 msgspec 从原始字节解码为 QueryRequest。
     """
+    query = await parse_json_body(request, _QUERY_DECODER)
     try:
-        logger.info(f"收到 RAG 查询: {request.question[:50]}...")
+        logger.info(f"收到 RAG 查询: {query.question[:50]}...")
         rag = get_rag_service()
-        result = await rag.query_and_generate(request.question, top_k=request.top_k)
+        result = await rag.query_and_generate(query.question, top_k=query.top_k)
         return QueryResponse(
             answer=result["answer"],
             sources=[SourceChunk(**s) for s in result["sources"]],
@@ -102,7 +249,45 @@ async def query_rag(request: QueryRequest):
         raise HTTPException(status_code=500, detail=f"RAG 查询失败: {str(e)}")
 
 
-@router.delete("/clear", response_model=ClearResponse)
+async def _stream_query_ndjson(question: str, top_k: int) -> AsyncIterator[bytes]:
+    """将 stream_query() 的事件逐条编码为 NDJSON 行
+
+    响应头在第一行发出时就已返回，之后的异常无法再转换为 HTTP 错误码，
+    因此生成过程中的异常以 {"error": ...} 行的形式作为最后一行返回。
+    """
+    try:
+        async for event in get_rag_service().stream_query(question, top_k=top_k):
+            yield orjson.dumps(event) + b"\n"
+    except Exception as e:
+        logger.error(f"RAG 流式查询失败: {e}")
+        yield orjson.dumps({"error": f"RAG 查询失败: {str(e)}"}) + b"\n"
+
+
+@router.post(
+    "/query/stream",
+    responses={200: {"content": {_NDJSON_MEDIA_TYPE: {}}}},
+    openapi_extra=json_body_openapi(QueryRequest)
+)
+async def query_rag_stream(request: Request):
+    """知识库流式问答（POST /api/rag/query/stream）
+
+    响应为 NDJSON，每行一个 JSON 对象：
+    - 第一行：{"sources": [...], "has_context": bool}，检索完成后立即返回
+    - 之后每行：{"delta": "..."}，LLM 生成的答案增量
+    - 出错时最后一行：{"error": "..."}
+
+    客户端应以 Accept-Encoding: identity 请求：GZip 中间件压缩时会缓冲数据，
+    答案增量要攒够一定字节数才会发出。
+    """
+    query = await parse_json_body(request, _QUERY_DECODER)
+    logger.info(f"收到 RAG 流式查询: {query.question[:50]}...")
+    return StreamingResponse(
+        _stream_query_ndjson(query.question, query.top_k),
+        media_type=_NDJSON_MEDIA_TYPE
+    )
+
+
+@router.delete("/clear", responses={200: {"model": ClearResponse}})
 async def clear_knowledge_base():
     """清空知识库（DELETE /api/rag/clear）
 
@@ -110,7 +295,8 @@ async def clear_knowledge_base():
     """
     try:
         rag = get_rag_service()
-        deleted = rag.clear()
+        # 与上传共用写锁，可能需要等待正在进行的入库完成，放到线程池执行
+        deleted = await run_in_threadpool(rag.clear)
         return ClearResponse(
             success=True,
             deleted_chunks=deleted,
@@ -121,8 +307,8 @@ async def clear_knowledge_base():
         raise HTTPException(status_code=500, detail=f"清空知识库失败: {str(e)}")
 
 
-@router.get("/stats")
-async def get_rag_stats() -> Dict[str, Any]:
+@router.get("/stats", responses={200: {"model": dict}})
+async def get_rag_stats():
     """获取知识库统计信息（GET /api/rag/stats）
 
     返回当前知识库中的文档块数量、Embedding 模型等信息。
@@ -7,17 +7,27 @@
 2. GET /api/health: 健康检查端点（用于前端检测后端是否在线）
 """
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import Response
 from loguru import logger
+import orjson
 
 from backend.api.models.schemas import SystemStats
-from backend.services.agent_service import get_agent_service
+from backend.services.agent_service import agent_service
 
 # 创建路由器实例，统计相关端点也挂载在 /api 前缀下
 router = APIRouter(prefix="/api", tags=["Statistics"])
 
+# 健康检查的响应内容固定不变，模块加载时预先序列化为字节，每次请求直接写出
+_HEALTH_BYTES = orjson.dumps({
+    "status": "healthy",
+    "service": "multi-agent-security-analysis",
+    "version": "1.0.0"
+})
 
-@router.get("/stats", response_model=SystemStats)
-async def get_system_stats():
+
+# 同步路由：由 Starlette 放到线程池执行，不占用事件循环
+@router.get("/stats", responses={200: {"model": SystemStats}})
+def get_system_stats():
     """获取系统统计信息（GET /api/stats）
     
     从内存存储中汇总统计数据，包括：
@@ -32,15 +42,14 @@ async def get_system_stats():
         HTTPException(500): 获取统计信息失败时返回服务器错误
     """
     try:
-        service = get_agent_service()
-        stats = service.get_stats()
+        stats = agent_service.get_stats()
         return stats
     except Exception as e:
         logger.error(f"获取统计信息失败: {e}")
         raise HTTPException(status_code=500, detail=f"获取统计失败: {str(e)}")
 
 
-@router.get("/health", response_model=dict)
+@router.get("/health", responses={200: {"model": dict}})
 async def health_check():
     """健康检查端点（GET /api/health）
     
@@ -48,10 +57,6 @@ async def health_check():
     返回 200 状态码表示服务健康。
     
     Returns:
-        dict: 包含服务状态、名称和版本的健康信息
+        Response: 预先序列化的健康信息（服务状态、名称和版本）
     """
-    return {
-        "status": "healthy",
-        "service": "multi-agent-security-analysis",
-        "version": "1.0.0"
-    }
+    return Response(content=_HEALTH_BYTES, media_type="application/json")
@@ -3,7 +3,7 @@
 后端配置管理模块（Backend Config）
 
 本模块集中管理后端服务的所有配置项，包括：
-- API 服务配置（主机地址、端口、热重载）
+- API 服务配置（运行环境、主机地址、端口、热重载、worker 进程数、事件循环和 HTTP 解析器实现）
 - CORS 跨域配置（允许的前端来源地址）
 - LLM 模型配置（从 .env 文件读取的 API Key 和模型参数）
 - 日志配置
@@ -12,60 +12,70 @@
   环境变量（.env 文件） > 代码中的默认值
 
 使用方式：
-    from backend.config import BackendConfig
-    BackendConfig.validate()        # 启动时验证配置
-    port = BackendConfig.API_PORT   # 读取配置值
+    from backend.config import CONFIG
+    CONFIG.validate()           # 启动时验证配置
+    port = CONFIG.API_PORT      # 读取配置值
 """
 import os
+import sys
+from dataclasses import dataclass
 from pathlib import Path
+from typing import Final, Optional, Tuple
 from dotenv import load_dotenv
 
 # 加载 .env 文件中的环境变量
 load_dotenv()
 
+
+@dataclass(frozen=True, slots=True)
 class BackendConfig:
     """后端配置类
     
-    使用类属性存储所有配置项，通过 BackendConfig.XXX 直接访问。
-    所有配置在模块加载时初始化，运行期间不会改变。
+    不可变（frozen）的数据类，所有配置项在 _build_config() 中一次性读取环境变量，
+    之后通过模块级单例 CONFIG.XXX 访问，运行期间不会改变。
+    slots=True 去掉实例 __dict__，属性访问更快、内存占用更小。
     """
     
     # 项目根目录路径（config.py 的上两级目录）
     # 用于构建其他文件的绝对路径
-    BASE_DIR = Path(__file__).resolve().parent.parent
+    BASE_DIR: Path
     
     # ===== API 服务配置 =====
-    API_HOST = os.getenv("API_HOST", "0.0.0.0")                             # 监听地址，0.0.0.0 表示接受所有网络接口的连接
-    API_PORT = int(os.getenv("API_PORT", "8000"))                            # 监听端口，默认 8000
-    API_RELOAD = os.getenv("API_RELOAD", "True").lower() == "true"          # 是否启用热重载（代码修改后自动重启，开发环境使用）
+    ENV: str                    # 运行环境：development / production（生产环境强制关闭热重载）
+    API_HOST: str               # 监听地址，0.0.0.0 表示接受所有网络接口的连接
+    API_PORT: int               # 监听端口，默认 8000
+    API_RELOAD: bool            # 是否启用热重载（代码修改后自动重启，开发环境使用）
+    API_WORKERS: int            # uvicorn worker 进程数（热重载开启时只能为 1）
+    API_LOOP: str               # uvicorn 事件循环实现：uvloop（libuv 实现，更快）/ asyncio
+    API_HTTP: str               # uvicorn HTTP 解析器：httptools（C 实现，更快）/ h11
     
     # ===== CORS 跨域配置 =====
-    # 允许跨域请求的来源列表
-    # Streamlit 前端默认运行在 8501 端口，需要允许其跨域调用后端 API
-    CORS_ORIGINS = [
-        "http://localhost:8501",    # Streamlit 默认端口
-        "http://localhost:3000",    # 备用前端端口（如 React/Vue 开发服务器）
-        "http://127.0.0.1:8501",   # localhost 的 IP 形式
-    ]
+    # 允许跨域请求的来源（不可变元组，Starlette CORS 中间件迭代更快）
+    CORS_ORIGINS: Tuple[str, ...]
+    CORS_ALLOW_CREDENTIALS: bool        # 是否允许携带 Cookie
+    CORS_METHODS: Tuple[str, ...]       # 允许的 HTTP 方法（显式列出，预检请求只需做集合查找）
+    CORS_HEADERS: Tuple[str, ...]       # 允许的请求头
     
     # ===== LLM 模型配置（从 .env 文件读取）=====
-    LLM_API_KEY = os.getenv("LLM_API_KEY")      # SiliconFlow API 密钥
-    MODEL_NAME = os.getenv("MODEL_NAME")          # 对话模型名称
-    MODEL_URL = os.getenv("MODEL_URL")            # API 基础 URL
+    LLM_API_KEY: Optional[str]      # SiliconFlow API 密钥
+    MODEL_NAME: Optional[str]       # 对话模型名称
+    MODEL_URL: Optional[str]        # API 基础 URL
     
     # ===== Embedding 配置（RAG 功能使用）=====
-    EMBEDDING_API_KEY = os.getenv("EMBEDDING_API_KEY", os.getenv("LLM_API_KEY"))   # 默认复用 LLM Key
-    EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "Qwen/Qwen3-Embedding-8B")
-    EMBEDDING_URL = os.getenv("EMBEDDING_URL", "https://api.siliconflow.cn/v1")
+    EMBEDDING_API_KEY: Optional[str]    # 默认复用 LLM Key
+    EMBEDDING_MODEL: str
+    EMBEDDING_URL: str
     
     # ChromaDB 本地持久化路径（相对于项目根目录）
-    CHROMA_DB_PATH = str(BASE_DIR / "chroma_db")
+    CHROMA_DB_PATH: str
+    
+    # Embedding 结果缓存（SQLite），重复入库相同文本时跳过 API 调用
+    EMBED_CACHE_PATH: str
     
     # ===== 日志配置 =====
-    LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")    # 日志级别：DEBUG, INFO, WARNING, ERROR
+    LOG_LEVEL: str              # 日志级别：DEBUG, INFO, WARNING, ERROR
     
-    @classmethod
-    def validate(cls):
+    def validate(self):
         """验证必需的配置项是否已设置
         
         在应用启动时调用，检查所有必需的环境变量是否存在。
@@ -83,7 +93,7 @@ class BackendConfig:
         
         # 逐一检查字段值是否为空
         for field in required_fields:
-            if not getattr(cls, field):
+            if not getattr(self, field):
                 missing.append(field)
         
         # 有缺失字段时抛出异常，列出所有缺失的配置名
@@ -91,3 +101,62 @@ class BackendConfig:
             raise ValueError(f"缺少必需的环境变量: {', '.join(missing)}")
         
         return True
+
+
+def _build_config() -> BackendConfig:
+    """读取环境变量，构建后端配置单例
+    
+    每个环境变量只读取一次；配置读取优先级：环境变量（.env 文件） > 默认值。
+    
+    Returns:
+        BackendConfig: 不可变的配置实例
+    """
+    base_dir = Path(__file__).resolve().parent.parent
+    llm_api_key = os.getenv("LLM_API_KEY")
+    env = os.getenv("ENV", "development").lower()
+    # 生产环境强制关闭热重载：热重载会额外启动一个监视进程持续轮询源码目录
+    api_reload = env != "production" and os.getenv("API_RELOAD", "True").lower() == "true"
+    
+    return BackendConfig(
+        BASE_DIR=base_dir,
+        ENV=env,
+        API_HOST=os.getenv("API_HOST", "0.0.0.0"),
+        API_PORT=int(os.getenv("API_PORT", "8000")),
+        API_RELOAD=api_reload,
+        # 分析历史（MemoryStorage）和结构化日志会话都保存在进程内，
+        # 多个 worker 之间不共享，因此默认单进程；可按需通过 API_WORKERS 开启多进程
+        API_WORKERS=1 if api_reload else int(os.getenv("API_WORKERS", "1")),
+        # uvloop 不支持 Windows，该平台默认回退到标准 asyncio 事件循环
+        API_LOOP=os.getenv("API_LOOP", "asyncio" if sys.platform == "win32" else "uvloop"),
+        API_HTTP=os.getenv("API_HTTP", "httptools"),
+        # API 没有身份认证，来源白名单是阻止任意网页在浏览器中跨域读取历史/统计、
+        # 清空知识库的唯一屏障，因此不使用通配来源 "*"。
+        # 环境变量 CORS_ORIGINS 以逗号分隔；Streamlit 前端默认运行在 8501 端口
+        CORS_ORIGINS=tuple(
+            origin.strip()
+            for origin in os.getenv(
+                "CORS_ORIGINS",
+                "http://localhost:8501,http://localhost:3000,http://127.0.0.1:8501"
+            ).split(",")
+            if origin.strip()
+        ),
+        # Streamlit 前端在服务端通过 requests 调用后端 API，不使用 Cookie 认证，关闭凭据
+        CORS_ALLOW_CREDENTIALS=False,
+        # 与已注册路由实际使用的方法/请求头保持一致
+        CORS_METHODS=("GET", "POST", "DELETE", "OPTIONS"),
+        CORS_HEADERS=("Content-Type", "Authorization"),
+        LLM_API_KEY=llm_api_key,
+        MODEL_NAME=os.getenv("MODEL_NAME"),
+        MODEL_URL=os.getenv("MODEL_URL"),
+        EMBEDDING_API_KEY=os.getenv("EMBEDDING_API_KEY", llm_api_key),
+        EMBEDDING_MODEL=os.getenv("EMBEDDING_MODEL", "Qwen/Qwen3-Embedding-8B"),
+        EMBEDDING_URL=os.getenv("EMBEDDING_URL", "https://api.siliconflow.cn/v1"),
+        CHROMA_DB_PATH=str(base_dir / "chroma_db"),
+        # 默认与向量库放在同一目录，随 Docker volume 一起持久化
+        EMBED_CACHE_PATH=os.getenv("EMBED_CACHE_PATH", str(base_dir / "chroma_db" / "embedding_cache.sqlite3")),
+        LOG_LEVEL=os.getenv("LOG_LEVEL", "INFO"),
+    )
+
+
+# 全局配置单例：模块加载时构建一次，所有模块共享
+CONFIG: Final[BackendConfig] = _build_config()
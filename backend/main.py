@@ -7,8 +7,8 @@ FastAPI 主应用入口 - 简化版（无RAG增强）
 主要职责：
 1. 创建和配置 FastAPI 应用实例
 2. 管理应用生命周期（启动时初始化智能体服务，关闭时清理资源）
-3. 配置 CORS 中间件（允许前端跨域访问）
-4. 注册 API 路由（分析路由 + 统计路由）
+3. 配置 CORS 中间件（允许前端跨域访问）和 GZip 压缩中间件
+4. 注册 API 路由（分析路由 + 统计路由 + RAG 路由，统一挂载）
 5. 提供根端点（服务信息）
 
 请求处理流程：
@@ -16,12 +16,16 @@ FastAPI 主应用入口 - 简化版（无RAG增强）
 """
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse, Response
 from contextlib import asynccontextmanager
 from loguru import logger
+import orjson
 
-from backend.config import BackendConfig
-from backend.api.routes import analysis, stats, rag
-from backend.services.agent_service import get_agent_service
+from backend.config import CONFIG
+from backend.api.routes import api_router
+from backend.services.agent_service import agent_service
+from src.models.llm_inference import close_llm_inference
 
 
 @asynccontextmanager
@@ -36,9 +40,11 @@ async def lifespan(app: FastAPI):
     启动流程：
     1. 验证后端配置（检查 API Key 等必需项）
     2. 初始化智能体服务（创建路由智能体和专家智能体）
+    3. 预先生成 OpenAPI 文档（schema 构建成本在启动时支付，而不是首次访问 /docs 时）
     
     关闭流程：
-    - 记录关闭日志（当前无需特殊清理操作）
+    - 关闭 LLM API 客户端共享的 HTTP 连接池
+    - 记录关闭日志
     
     Args:
         app: FastAPI 应用实例
@@ -48,7 +54,7 @@ async def lifespan(app: FastAPI):
 
     # 步骤1: 验证配置项是否完整
     try:
-        BackendConfig.validate()
+        CONFIG.validate()
         logger.info("配置验证通过")
     except ValueError as e:
         logger.error(f"配置验证失败: {e}")
@@ -57,19 +63,23 @@ async def lifespan(app: FastAPI):
     # 步骤2: 初始化智能体服务（单例模式）
     # 这会创建 MultiAgentSystem 并初始化所有智能体
     try:
-        service = get_agent_service()
-        await service.initialize()      # 异步初始化：创建路由智能体 + 3个专家智能体
+        await agent_service.initialize()      # 异步初始化：创建路由智能体 + 3个专家智能体
         logger.info("✓ 智能体服务初始化完成")
     except Exception as e:
         logger.error(f"智能体服务初始化失败: {e}")
         raise
 
+    # 步骤3: 预先生成 OpenAPI schema（FastAPI 会缓存到 app.openapi_schema）
+    # 请求体的 msgspec 解码器已在模块导入时构建，这里补齐响应模型的 schema 生成
+    app.openapi()
+
     logger.info("✓ FastAPI服务启动完成")
 
     yield   # 应用运行中...
 
     # ===== 关闭阶段 =====
     logger.info("FastAPI服务正在关闭...")
+    await close_llm_inference()
 
 
 # ==================== 创建 FastAPI 应用实例 ====================
@@ -77,7 +87,8 @@ app = FastAPI(
     title="多智能体安全分析系统 API",                           # API 文档标题
     description="基于多智能体架构的网络安全威胁智能分析系统",      # API 文档描述
     version="1.0.0",                                           # API 版本号
-    lifespan=lifespan                                          # 绑定生命周期管理器
+    lifespan=lifespan,                                         # 绑定生命周期管理器
+    default_response_class=ORJSONResponse                      # 默认使用 orjson（C 扩展）序列化响应体
 )
 
 # ==================== 配置 CORS 中间件 ====================
@@ -85,18 +96,34 @@ app = FastAPI(
 # 这对于 Streamlit（8501端口）调用 FastAPI（8000端口）是必需的
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=BackendConfig.CORS_ORIGINS,     # 允许的来源列表（前端地址）
-    allow_credentials=True,                        # 允许携带 Cookie
-    allow_methods=["*"],                           # 允许所有 HTTP 方法（GET, POST 等）
-    allow_headers=["*"],                           # 允许所有请求头
+    allow_origins=CONFIG.CORS_ORIGINS,            # 允许的来源列表（前端地址，环境变量 CORS_ORIGINS）
+    allow_credentials=CONFIG.CORS_ALLOW_CREDENTIALS,   # 不携带 Cookie
+    allow_methods=CONFIG.CORS_METHODS,             # 允许的 HTTP 方法（GET, POST, DELETE, OPTIONS）
+    allow_headers=CONFIG.CORS_HEADERS,             # 允许的请求头（Content-Type, Authorization）
+)
+
+# ==================== 配置 GZip 压缩中间件 ====================
+# /api/history、/api/stats 返回的 JSON 重复度高，压缩后体积可缩小数倍；
+# 小于 minimum_size 的响应（如 /api/analyze、/api/health）不压缩，避免白白消耗 CPU
+app.add_middleware(
+    GZipMiddleware,
+    minimum_size=1024,                             # 响应体超过 1KB 才压缩
+    compresslevel=5,                               # 压缩级别：在 CPU 开销和压缩率之间折中
 )
 
 # ==================== 注册 API 路由 ====================
-# 将分析路由和统计路由注册到应用
-# 路由前缀在各自的文件中定义（均为 /api）
-app.include_router(analysis.router)     # /api/analyze, /api/history
-app.include_router(stats.router)        # /api/stats, /api/health
-app.include_router(rag.router)          # /api/rag/upload, /api/rag/query, /api/rag/clear
+# 分析、统计和 RAG 路由已在 backend.api.routes 中汇总为一个顶层路由
+# 路由前缀在各自的文件中定义（/api 和 /api/rag）
+app.include_router(api_router)
+
+
+# 根端点的响应内容固定不变，启动时预先序列化为字节
+_ROOT_BYTES = orjson.dumps({
+    "service": "多智能体安全分析系统",
+    "version": "1.0.0",
+    "docs": "/docs",               # Swagger UI 自动生成的 API 文档
+    "health": "/api/health"         # 健康检查端点
+})
 
 
 @app.get("/")
@@ -106,14 +133,9 @@ async def root():
     访问 http://localhost:8000/ 可查看服务状态和常用 URL。
     
     Returns:
-        dict: 服务名称、版本、文档地址和健康检查地址
+        Response: 预先序列化的服务名称、版本、文档地址和健康检查地址
     """
-    return {
-        "service": "多智能体安全分析系统",
-        "version": "1.0.0",
-        "docs": "/docs",               # Swagger UI 自动生成的 API 文档
-        "health": "/api/health"         # 健康检查端点
-    }
+    return Response(content=_ROOT_BYTES, media_type="application/json")
 
 
 # ==================== 直接运行入口 ====================
@@ -123,8 +145,10 @@ if __name__ == "__main__":
 
     uvicorn.run(
         "backend.main:app",                         # 应用模块路径
-        host=BackendConfig.API_HOST,                 # 监听地址
-        port=BackendConfig.API_PORT,                 # 监听端口
-        reload=BackendConfig.API_RELOAD,             # 热重载开关
-        log_level=BackendConfig.LOG_LEVEL.lower()    # 日志级别
+        host=CONFIG.API_HOST,                        # 监听地址
+        port=CONFIG.API_PORT,                        # 监听端口
+        reload=CONFIG.API_RELOAD,                    # 热重载开关
+        loop=CONFIG.API_LOOP,                        # 事件循环实现（默认 uvloop）
+        http=CONFIG.API_HTTP,                        # HTTP 解析器（默认 httptools）
+        log_level=CONFIG.LOG_LEVEL.lower()           # 日志级别
     )
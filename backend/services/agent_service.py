@@ -20,7 +20,7 @@ from loguru import logger
 
 from src.agents.optimized_system import MultiAgentSystem
 from backend.services.memory_storage import get_memory_storage
-from backend.api.models.schemas import AlertData, AnalysisResult
+from backend.api.models.schemas import AlertData
 
 
 class AgentService:
@@ -68,20 +68,23 @@ class AgentService:
             logger.error(f"智能体服务初始化失败: {e}")
             raise
     
-    async def analyze_alert(self, alert_data: AlertData) -> AnalysisResult:
+    async def analyze_alert(self, alert_data: AlertData) -> Dict[str, Any]:
         """分析安全告警（异步方法）- 核心业务方法
         
         完整的处理流程：
-        1. 将 Pydantic 模型（AlertData）转换为普通字典（智能体系统使用字典接口）
+        1. 将 msgspec 请求结构（AlertData）转换为普通字典（智能体系统使用字典接口）
         2. 调用 MultiAgentSystem.analyze() 执行完整的路由→分析→综合流程
         3. 将分析结果保存到内存存储（生成 analysis_id）
-        4. 将字典结果转换为 Pydantic 模型（AnalysisResult）返回给路由层
+        4. 在结果字典上补充 analysis_id 和 message 后直接返回
+        
+        返回值的结构与 AnalysisResult 模型一致，但不再构建 Pydantic 对象：
+        路由层直接将字典交给 ORJSONResponse 序列化，省去模型分配和转换开销。
         
         Args:
-            alert_data: Pydantic 验证后的告警数据
+            alert_data: msgspec 解码校验后的告警数据
             
         Returns:
-            AnalysisResult: 结构化的分析结果（Pydantic 模型）
+            dict: 分析结果字典（结构同 AnalysisResult）
             
         Raises:
             RuntimeError: 服务未初始化时抛出
@@ -91,7 +94,7 @@ class AgentService:
         
         logger.info(f"收到分析请求: {alert_data.attack_type}")
         
-        # 步骤1: 将 Pydantic 模型转换为字典
+        # 步骤1: 将 AlertData 结构转换为字典
         # MultiAgentSystem 使用字典接口，这里做数据格式转换
         alert_dict = {
             'attack_type': alert_data.attack_type,
@@ -109,23 +112,13 @@ class AgentService:
         # 步骤3: 将分析结果保存到内存存储
         # save_analysis() 返回 analysis_id，用于后续历史记录查询
         analysis_id = self.storage.save_analysis(alert_dict, result)
-        result['analysis_id'] = analysis_id
         
-        # 步骤4: 将字典结果转换为 Pydantic AnalysisResult 模型
-        # 这确保响应数据完全符合 API 的 Schema 定义
-        analysis_result = AnalysisResult(
-            success=result.get('success', True),
-            task_id=result.get('task_id'),
-            analysis_id=analysis_id,
-            timestamp=result.get('timestamp'),
-            routing=result.get('routing'),
-            expert_analysis=result.get('expert_analysis'),
-            performance=result.get('performance'),
-            message="分析完成"
-        )
+        # 步骤4: 补充响应字段，直接返回字典
+        result['analysis_id'] = analysis_id
+        result['message'] = "分析完成"
         
         logger.info(f"分析完成: {analysis_id}")
-        return analysis_result
+        return result
     
     def get_analysis_history(
         self,
@@ -172,7 +165,9 @@ class AgentService:
 
 
 # ==================== 全局单例管理 ====================
-_service_instance: Optional[AgentService] = None
+# 模块导入时即创建唯一实例，路由层直接引用 agent_service，
+# 省去每次请求的函数调用、global 查找和 None 判断
+agent_service: AgentService = AgentService()
 
 
 def get_agent_service() -> AgentService:
@@ -182,10 +177,9 @@ def get_agent_service() -> AgentService:
     - MultiAgentSystem 只初始化一次
     - MemoryStorage 中的数据在所有请求间共享
     
+    热路径请直接使用模块级的 agent_service，此函数保留用于兼容。
+    
     Returns:
         AgentService: 全局唯一的服务实例
     """
-    global _service_instance
-    if _service_instance is None:
-        _service_instance = AgentService()
-    return _service_instance
+    return agent_service
@@ -2,19 +2,25 @@
 """
 内存存储服务（Memory Storage）- 替代 ChromaDB 的轻量方案
 
-本模块提供基于 Python 列表的内存存储，用于保存和查询分析历史记录。
+本模块提供基于双端队列（deque）的内存存储，用于保存和查询分析历史记录。
 相比 ChromaDB 等向量数据库，这是一个更轻量的实现，适用于开发和演示场景。
 
 特点：
 - 纯内存存储，无外部依赖（不需要数据库服务）
-- 支持多维度过滤（威胁等级、攻击类型、时间范围）
+- 支持多维度过滤（威胁等级、攻击类型、时间范围），通过二级索引避免全表扫描
 - 支持分页查询
 - 自动限制历史记录大小（最多 100 条，防止内存溢出）
 - 服务重启后数据会丢失（如需持久化，可替换为数据库实现）
+- 线程安全：写入和查询通过一把锁串行化（同步路由在线程池中执行，可能与写入并发）
 
 设计模式：单例模式 + 工厂函数
 """
-from typing import Dict, List, Any, Optional
+from typing import Deque, Dict, List, Any, Optional
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import Counter, deque
+import threading
+from itertools import islice
 import time
 from loguru import logger
 
@@ -22,26 +28,50 @@ from loguru import logger
 class MemoryStorage:
     """内存存储服务 - 简化版历史记录存储
     
-    使用 Python 列表存储分析记录，新记录插入到列表头部（最新的在前）。
-    当记录数超过 max_history_size 时，自动丢弃最旧的记录。
+    使用定长 deque 存储分析记录，新记录从左端插入（最新的在前）。
+    当记录数达到 max_history_size 时，deque 在 O(1) 内自动丢弃最旧的记录。
+    
+    二级索引：每条记录分配一个单调递增的序号（seq），序号越大越新。
+    - _by_threat / _by_attack: 字段值 → 升序排列的序号列表
+    - _ts_col / _ts_seq: 按时间戳排序的两列紧凑数组（列式存储），
+      bisect 直接比较 C double，无需构造 (timestamp, seq) 元组
+    查询时只需处理命中索引的候选记录，而不是逐条扫描全部历史。
     """
     
     def __init__(self):
         """初始化内存存储
         
-        创建空的历史记录列表和配置最大存储容量。
+        创建空的历史记录列表、二级索引和配置最大存储容量。
         """
-        self.analysis_history: List[Dict[str, Any]] = []    # 分析历史记录列表（最新的在前）
         self.max_history_size = 100                          # 最大保存记录数，超过后自动淘汰旧记录
+        self.analysis_history: Deque[Dict[str, Any]] = deque(maxlen=self.max_history_size)  # 分析历史记录（最新的在前）
+        
+        # 二级索引（随 save_analysis 增量维护，淘汰记录时同步移除）
+        self._seq = 0                                        # 下一条记录的序号
+        self._records: Dict[int, Dict[str, Any]] = {}        # 序号 → 记录（按插入顺序，最旧的在前）
+        self._by_threat: Dict[str, List[int]] = {}           # 威胁等级 → 序号列表（升序）
+        self._by_attack: Dict[str, List[int]] = {}           # 攻击类型 → 序号列表（升序）
+        self._ts_col = array('d')                            # 时间戳列（升序）
+        self._ts_seq = array('q')                            # 与 _ts_col 对齐的序号列
+        
+        # 统计聚合（随保存/淘汰增量更新，get_stats 无需遍历历史记录）
+        self._threat_counter: Counter = Counter()            # 威胁等级 → 记录数
+        self._attack_counter: Counter = Counter()            # 攻击类型 → 记录数
+        
+        # 保护历史记录、二级索引和统计聚合的一致性：
+        # 保存是多步复合操作（插入 + 建索引 + 淘汰），不能与查询交错执行
+        self._lock = threading.Lock()
         logger.info("内存存储服务已初始化")
     
     def save_analysis(self, alert_data: Dict[str, Any], result: Dict[str, Any]) -> str:
         """保存一条分析结果到内存存储
         
         从告警数据和分析结果中提取关键字段，创建精简的历史记录并保存。
-        新记录插入到列表头部（index=0），确保按时间倒序排列。
+        同时预先构建历史列表项（summary），供 /api/history 直接序列化。
+        新记录从 deque 左端插入，确保按时间倒序排列。
         
-        自动容量管理：当记录数超过 max_history_size 时，截断列表丢弃最旧的记录。
+        自动容量管理：deque(maxlen) 满员时自动丢弃右端（最旧的）记录，
+        二级索引中对应的条目同步移除。
         
         Args:
             alert_data: 原始告警数据字典
@@ -63,13 +93,23 @@ class MemoryStorage:
             'threat_level': result.get('expert_analysis', {}).get('threat_level', ''),   # 冗余存储
             'risk_score': result.get('expert_analysis', {}).get('risk_score', 0)         # 冗余存储
         }
+        # 预先构建 /api/history 列表项（字段与 AnalysisHistory 一致），查询时无需再逐条投影
+        record['summary'] = {
+            'analysis_id': record['analysis_id'],
+            'attack_type': record['attack_type'],
+            'threat_level': record['threat_level'],
+            'risk_score': record['risk_score'],
+            'timestamp': record['timestamp']
+        }
         
-        # 新记录插入到列表头部（index=0），保持按时间倒序排列
-        self.analysis_history.insert(0, record)
-        
-        # 自动容量管理：超过最大容量时，丢弃尾部（最旧的）记录
-        if len(self.analysis_history) > self.max_history_size:
-            self.analysis_history = self.analysis_history[:self.max_history_size]
+        with self._lock:
+            # 新记录从左端插入，保持按时间倒序排列；满员时 deque 自动丢弃右端（最旧的）记录
+            self.analysis_history.appendleft(record)
+            self._index_record(record)
+            
+            # 二级索引与 deque 保持一致：移除已被淘汰的记录
+            while len(self._records) > self.max_history_size:
+                self._evict_oldest()
         
         logger.info(f"分析记录已保存: {analysis_id}")
         return analysis_id
@@ -85,12 +125,13 @@ class MemoryStorage:
     ) -> List[Dict[str, Any]]:
         """获取分析历史记录（支持过滤和分页）
         
-        过滤流程（链式过滤）：
-        1. 先按威胁等级过滤（如果指定）
-        2. 再按攻击类型过滤（如果指定）
-        3. 再按起始时间过滤（如果指定）
-        4. 再按结束时间过滤（如果指定）
-        5. 最后按 offset 和 limit 进行分页截取
+        查询流程（基于二级索引）：
+        1. 威胁等级、攻击类型直接查索引得到候选序号列表
+        2. 时间范围在 _ts_col 上用 bisect 定位区间，得到候选序号（按序号排序）
+        3. 以最小的候选列表为基准，从最新的序号开始单次遍历，逐个检查是否命中其余条件
+        4. 跳过 offset 条后收集 limit 条即停止遍历，不为未返回的记录做任何工作
+        
+        未指定任何过滤条件时直接在历史 deque 上迭代截取。整个查询在锁内完成，读到的是一致的快照。
         
         Args:
             limit: 返回的最大记录数（默认 50）
@@ -103,35 +144,94 @@ class MemoryStorage:
         Returns:
             List[Dict]: 符合条件的历史记录列表（已分页）
         """
-        # 从全量数据开始，逐步应用过滤条件
-        filtered = self.analysis_history
+        with self._lock:
+            # 无过滤条件：历史 deque 本身就是倒序的，用 islice 截取（deque 不支持切片）
+            if not (threat_level or attack_type or start_time or end_time):
+                result = list(islice(self.analysis_history, offset, offset + limit))
+                logger.info(f"查询历史记录: 共{len(self.analysis_history)}条, 返回{len(result)}条")
+                return result
+            
+            # 收集各过滤条件命中的候选序号
+            candidates: List[List[int]] = []
+            
+            # 按威胁等级过滤
+            if threat_level:
+                candidates.append(self._by_threat.get(threat_level, []))
+            
+            # 按攻击类型过滤
+            if attack_type:
+                candidates.append(self._by_attack.get(attack_type, []))
+            
+            # 按时间范围过滤（start_time <= timestamp <= end_time），用二分查找定位区间
+            if start_time or end_time:
+                lo = bisect_left(self._ts_col, start_time) if start_time else 0
+                hi = bisect_right(self._ts_col, end_time) if end_time else len(self._ts_col)
+                candidates.append(sorted(self._ts_seq[lo:hi]))
+            
+            # 以最小的候选列表为基准，其余条件转为集合做 O(1) 成员检查
+            candidates.sort(key=len)
+            base = candidates[0]
+            others = [set(c) for c in candidates[1:]]
+            
+            # 单次遍历 + 提前终止：从最新的序号开始惰性过滤，islice 收集满一页即停止
+            matches = (
+                self._records[seq] for seq in reversed(base)
+                if all(seq in o for o in others)
+            )
+            result = list(islice(matches, offset, offset + limit))
+            
+            logger.info(f"查询历史记录: 返回{len(result)}条")
+            return result
+    
+    def _index_record(self, record: Dict[str, Any]) -> None:
+        """为新记录分配序号并写入各二级索引
         
-        # 按威胁等级过滤
-        if threat_level:
-            filtered = [r for r in filtered if r.get('threat_level') == threat_level]
+        Args:
+            record: 刚保存的历史记录
+        """
+        seq = self._seq
+        self._seq += 1
+        self._records[seq] = record
+        self._by_threat.setdefault(record['threat_level'], []).append(seq)
+        self._by_attack.setdefault(record['attack_type'], []).append(seq)
+        # 时间戳相同时插到末尾，两列始终按 (timestamp, seq) 有序
+        pos = bisect_right(self._ts_col, record['timestamp'])
+        self._ts_col.insert(pos, record['timestamp'])
+        self._ts_seq.insert(pos, seq)
         
-        # 按攻击类型过滤
-        if attack_type:
-            filtered = [r for r in filtered if r.get('attack_type') == attack_type]
+        self._threat_counter[record['threat_level']] += 1
+        self._attack_counter[record['attack_type']] += 1
+    
+    def _evict_oldest(self) -> None:
+        """从二级索引和统计聚合中移除最旧的一条记录
         
-        # 按起始时间过滤（只保留时间戳 >= start_time 的记录）
-        if start_time:
-            filtered = [r for r in filtered if r.get('timestamp', 0) >= start_time]
+        最旧记录的序号在其所属的每个索引列表中都位于开头，
+        因此只需弹出列表首元素；时间列通过二分查找定位到该时间戳，再在序号列中找到对应位置删除。
+        """
+        seq, record = next(iter(self._records.items()))
+        del self._records[seq]
         
-        # 按结束时间过滤（只保留时间戳 <= end_time 的记录）
-        if end_time:
-            filtered = [r for r in filtered if r.get('timestamp', 0) <= end_time]
+        for index, key in ((self._by_threat, record['threat_level']),
+                           (self._by_attack, record['attack_type'])):
+            seqs = index[key]
+            seqs.pop(0)
+            if not seqs:
+                del index[key]
         
-        # 分页：使用列表切片实现 offset + limit 分页
-        result = filtered[offset:offset + limit]
+        pos = self._ts_seq.index(seq, bisect_left(self._ts_col, record['timestamp']))
+        del self._ts_col[pos]
+        del self._ts_seq[pos]
         
-        logger.info(f"查询历史记录: 共{len(filtered)}条, 返回{len(result)}条")
-        return result
+        for counter, key in ((self._threat_counter, record['threat_level']),
+                             (self._attack_counter, record['attack_type'])):
+            counter[key] -= 1
+            if not counter[key]:
+                del counter[key]
     
     def get_stats(self) -> Dict[str, Any]:
         """获取系统统计信息
         
-        遍历所有历史记录，统计：
+        直接读取增量维护的统计聚合，不再遍历历史记录：
         - 总分析次数
         - 威胁等级分布（各等级的记录数量）
         - 攻击类型分布（各攻击类型的记录数量）
@@ -139,32 +239,12 @@ class MemoryStorage:
         Returns:
             dict: 统计信息字典，当无历史记录时返回空分布
         """
-        # 无数据时返回空统计
-        if not self.analysis_history:
+        with self._lock:
             return {
-                'total_analyses': 0,
-                'threat_level_distribution': {},
-                'attack_type_distribution': {}
+                'total_analyses': len(self.analysis_history),              # deque 长度为 O(1)
+                'threat_level_distribution': dict(self._threat_counter),   # {"高危": 5, "中危": 3, ...}
+                'attack_type_distribution': dict(self._attack_counter)     # {"SQL注入": 4, "XSS攻击": 2, ...}
             }
-        
-        # 遍历所有记录，统计威胁等级和攻击类型的频次
-        threat_levels = {}      # {"高危": 5, "中危": 3, ...}
-        attack_types = {}       # {"SQL注入": 4, "XSS攻击": 2, ...}
-        
-        for record in self.analysis_history:
-            # 统计威胁等级分布
-            level = record.get('threat_level', '未知')
-            threat_levels[level] = threat_levels.get(level, 0) + 1
-            
-            # 统计攻击类型分布
-            atype = record.get('attack_type', '未知')
-            attack_types[atype] = attack_types.get(atype, 0) + 1
-        
-        return {
-            'total_analyses': len(self.analysis_history),
-            'threat_level_distribution': threat_levels,
-            'attack_type_distribution': attack_types
-        }
 
 
 # ==================== 全局单例管理 ====================
@@ -175,7 +255,7 @@ def get_memory_storage() -> MemoryStorage:
     """获取内存存储单例（工厂函数）
     
     确保整个应用共享同一个 MemoryStorage 实例，
-    所有分析结果保存在同一个列表中。
+    所有分析结果保存在同一个 deque 中。
     
     Returns:
         MemoryStorage: 全局唯一的内存存储实例
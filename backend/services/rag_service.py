@@ -3,24 +3,33 @@
 RAG 检索增强生成服务（RAG Service）
 
 为系统提供基于本地向量库的文档检索和问答能力：
-1. 文档入库：接收文本 → 分块 → 调用 SiliconFlow Embedding API → 存入 ChromaDB
+1. 文档入库：接收文本 → 分块 → 调用 SiliconFlow Embedding API（已缓存的文本块跳过）→ 存入 ChromaDB
 2. 检索：接收问题 → Embedding → 向量相似度检索 → 返回最相关文档块
-3. 生成：将检索结果拼接为 Context → 调用 LLM 生成答案
+3. 生成：将检索结果拼接为 Context → 调用 LLM 生成答案（支持流式逐段返回）
 
 使用方式：
     from backend.services.rag_service import get_rag_service
     rag = get_rag_service()
     rag.add_documents(["文本内容..."], source_name="文档名")
     result = await rag.query_and_generate("问题")
+    async for event in rag.stream_query("问题"): ...
 """
 import asyncio
-from typing import List, Dict, Any, Optional
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from collections import OrderedDict
+from pathlib import Path
+from typing import AsyncIterator, List, Dict, Any, Optional, Tuple
+import hashlib
+import sqlite3
+import threading
+import uuid
 from loguru import logger
-from openai import OpenAI
+import numpy as np
+from openai import AsyncOpenAI, OpenAI
 import chromadb
 from chromadb.config import Settings
 
-from backend.config import BackendConfig
+from backend.config import CONFIG
 
 # ==================== 全局单例 ====================
 _rag_service_instance: Optional["RAGService"] = None
@@ -47,33 +56,91 @@ class RAGService:
     # 文档分块参数
     CHUNK_SIZE = 500        # 每块最大字符数
     CHUNK_OVERLAP = 50      # 相邻块的重叠字符数（保证上下文连续性）
+    CHUNK_STEP = CHUNK_SIZE - CHUNK_OVERLAP     # 相邻块起点的间隔
     COLLECTION_NAME = "rag_documents"
 
+    # Embedding 批处理参数
+    EMBED_BATCH_SIZE = 64   # 每次 Embedding API 调用的最大文本数
+    EMBED_WORKERS = 4       # 并发发起 Embedding 请求的线程数（网络 I/O 密集）
+    QUERY_CACHE_SIZE = 1024 # 问题向量 LRU 缓存容量
+    SQLITE_MAX_PARAMS = 500 # 单条 SQL 中 IN (...) 的最大参数个数（低于 SQLite 默认上限）
+
+    # 问答提示词（固定部分只在类定义时构建一次）
+    SYSTEM_PROMPT = (
+        "你是一个专业的知识库问答助手。请严格根据以下参考文档回答用户的问题。\n"
+        "如果参考文档中没有足够的信息，请如实说明，不要编造答案。\n"
+        "回答应该简洁、准确、有条理。"
+    )
+    USER_PROMPT_TEMPLATE = """参考文档：
+{context}
+
+用户问题：{question}
+
+请基于上述参考文档回答问题："""
+
     def __init__(self):
         """初始化向量库客户端和 API 客户端"""
         # 初始化 ChromaDB（本地持久化）
         self._chroma_client = chromadb.PersistentClient(
-            path=BackendConfig.CHROMA_DB_PATH,
+            path=CONFIG.CHROMA_DB_PATH,
             settings=Settings(anonymized_telemetry=False)
         )
         self._collection = self._chroma_client.get_or_create_collection(
             name=self.COLLECTION_NAME,
             metadata={"hnsw:space": "cosine"}   # 使用余弦相似度
         )
-        logger.info(f"ChromaDB 已初始化，路径: {BackendConfig.CHROMA_DB_PATH}")
+        logger.info(f"ChromaDB 已初始化，路径: {CONFIG.CHROMA_DB_PATH}")
+        self._cached_count: Optional[int] = None     # 文档块数量缓存，入库/清空时失效
+        # 写锁：入库和清空由 API 路由放到线程池执行，需串行化对集合的修改
+        # （避免清空知识库时替换集合对象与正在进行的入库交错）
+        self._write_lock = threading.Lock()
 
         # 初始化 SiliconFlow Embedding 客户端
+        # 同步客户端用于文档入库（在线程池中并发批量调用），
+        # 异步客户端用于问答检索（在事件循环上等待，不阻塞其他请求）
         self._embed_client = OpenAI(
-            api_key=BackendConfig.EMBEDDING_API_KEY,
-            base_url=BackendConfig.EMBEDDING_URL
+            api_key=CONFIG.EMBEDDING_API_KEY,
+            base_url=CONFIG.EMBEDDING_URL
+        )
+        self._embed_async = AsyncOpenAI(
+            api_key=CONFIG.EMBEDDING_API_KEY,
+            base_url=CONFIG.EMBEDDING_URL
         )
 
-        # 初始化 LLM 客户端（复用已有配置）
-        self._llm_client = OpenAI(
-            api_key=BackendConfig.LLM_API_KEY,
-            base_url=BackendConfig.MODEL_URL
+        # 初始化异步 LLM 客户端（复用已有配置）：基于 httpx.AsyncClient，
+        # 生成答案时直接在事件循环上等待，不占用线程池线程
+        self._llm_client = AsyncOpenAI(
+            api_key=CONFIG.LLM_API_KEY,
+            base_url=CONFIG.MODEL_URL
         )
-        logger.info(f"Embedding 模型: {BackendConfig.EMBEDDING_MODEL}")
+        logger.info(f"Embedding 模型: {CONFIG.EMBEDDING_MODEL}")
+
+        # Embedding 持久化缓存：sha256(模型名 + 文本块) → float32 向量字节
+        # 重新上传相同文档时只为新文本块调用 Embedding API
+        Path(CONFIG.EMBED_CACHE_PATH).parent.mkdir(parents=True, exist_ok=True)
+        self._embed_cache = sqlite3.connect(CONFIG.EMBED_CACHE_PATH, check_same_thread=False)
+        self._embed_cache.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (hash BLOB PRIMARY KEY, vec BLOB NOT NULL)"
+        )
+
+        # 问题向量 LRU 缓存：重复的问题不再调用 Embedding API
+        # （问题向量与知识库内容无关，clear() 清空知识库时保留）
+        # 查询路径是异步的，functools.lru_cache 无法缓存协程结果，这里用 OrderedDict 实现
+        # 缓存中的向量以 float16 保存（内存减半，相似度检索对 16 位精度不敏感）
+        self._query_cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+
+    def _count(self) -> int:
+        """获取向量库中的文档块数量（带缓存）
+
+        ChromaDB 的 count() 需要查询底层存储，这里缓存结果，
+        只在 add_documents() / clear() 修改集合后重新读取。
+
+        Returns:
+            int: 文档块数量
+        """
+        if self._cached_count is None:
+            self._cached_count = self._collection.count()
+        return self._cached_count
 
     # ==================== 文档分块 ====================
     def _split_text(self, text: str) -> List[str]:
@@ -85,34 +152,130 @@ class RAGService:
         Returns:
             List[str]: 文本块列表
         """
-        chunks = []
-        start = 0
         text = text.strip()
-        while start < len(text):
-            end = min(start + self.CHUNK_SIZE, len(text))
-            chunks.append(text[start:end])
-            start += self.CHUNK_SIZE - self.CHUNK_OVERLAP
-        return [c for c in chunks if c.strip()]
+        # 块起点由 range 直接生成（C 层计算偏移，无需逐块做 Python 算术），
+        # 切片越界时自动截断到文本末尾；分块和空白块过滤在同一个推导式中完成。
+        # 起点都小于文本长度，块不会为空；isspace() 直接返回布尔值，不像 strip() 那样复制字符串
+        return [
+            chunk for start in range(0, len(text), self.CHUNK_STEP)
+            if not (chunk := text[start:start + self.CHUNK_SIZE]).isspace()
+        ]
 
     # ==================== Embedding ====================
-    def _get_embeddings(self, texts: List[str]) -> List[List[float]]:
+    def _get_embeddings(self, texts: List[str]) -> np.ndarray:
         """批量调用 SiliconFlow API 获取文本向量
 
+        向量以连续的 float32 数组返回（每个分量 4 字节），
+        而不是由装箱 Python float 组成的嵌套列表。
+
         Args:
             texts: 待向量化的文本列表
 
         Returns:
-            List[List[float]]: 每条文本的 embedding 向量
+            np.ndarray: 形状为 (len(texts), dim) 的 float32 向量矩阵
         """
         response = self._embed_client.embeddings.create(
-            model=BackendConfig.EMBEDDING_MODEL,
+            model=CONFIG.EMBEDDING_MODEL,
+            input=texts
+        )
+        return np.asarray([item.embedding for item in response.data], dtype=np.float32)
+
+    async def _get_embeddings_async(self, texts: List[str]) -> np.ndarray:
+        """异步调用 SiliconFlow API 获取文本向量
+
+        Args:
+            texts: 待向量化的文本列表
+
+        Returns:
+            np.ndarray: 形状为 (len(texts), dim) 的 float32 向量矩阵
+        """
+        response = await self._embed_async.embeddings.create(
+            model=CONFIG.EMBEDDING_MODEL,
             input=texts
         )
-        return [item.embedding for item in response.data]
+        return np.asarray([item.embedding for item in response.data], dtype=np.float32)
+
+    async def _embed_query(self, text: str) -> np.ndarray:
+        """获取单条问题文本的向量（带 LRU 缓存）
+
+        Args:
+            text: 问题文本
+
+        Returns:
+            np.ndarray: float32 向量（缓存中以 float16 保存，返回时转换回 ChromaDB 需要的 float32）
+        """
+        cached = self._query_cache.get(text)
+        if cached is not None:
+            self._query_cache.move_to_end(text)
+            return cached.astype(np.float32)
+
+        embedding = (await self._get_embeddings_async([text]))[0]
+        self._query_cache[text] = embedding.astype(np.float16)
+        if len(self._query_cache) > self.QUERY_CACHE_SIZE:
+            self._query_cache.popitem(last=False)   # 淘汰最久未使用的问题
+        return embedding
+
+    # ==================== Embedding 持久化缓存 ====================
+    @staticmethod
+    def _chunk_hash(chunk: str) -> bytes:
+        """计算文本块的缓存键（不同 Embedding 模型的向量互不复用）"""
+        return hashlib.sha256(f"{CONFIG.EMBEDDING_MODEL}\0{chunk}".encode("utf-8")).digest()
+
+    def _load_cached_embeddings(self, hashes: List[bytes]) -> Dict[bytes, np.ndarray]:
+        """从 SQLite 缓存中批量读取已有的向量
+
+        Args:
+            hashes: 文本块缓存键列表
+
+        Returns:
+            Dict[bytes, np.ndarray]: 命中缓存的 缓存键 → float32 向量
+        """
+        unique = list(set(hashes))
+        cached = {}
+        for start in range(0, len(unique), self.SQLITE_MAX_PARAMS):
+            part = unique[start:start + self.SQLITE_MAX_PARAMS]
+            placeholders = ",".join("?" * len(part))
+            rows = self._embed_cache.execute(
+                f"SELECT hash, vec FROM embeddings WHERE hash IN ({placeholders})", part
+            )
+            for key, vec in rows:
+                cached[key] = np.frombuffer(vec, dtype=np.float32)
+        return cached
+
+    def _store_cached_embeddings(self, fresh: Dict[bytes, np.ndarray]) -> None:
+        """将新生成的向量以 float32 原始字节写入 SQLite 缓存"""
+        if not fresh:
+            return
+        with self._embed_cache:
+            self._embed_cache.executemany(
+                "INSERT OR REPLACE INTO embeddings (hash, vec) VALUES (?, ?)",
+                [(key, vec.tobytes()) for key, vec in fresh.items()]
+            )
+
+    def _embed_batch(
+        self,
+        batch: List[str],
+        hashes: List[bytes],
+        cached: Dict[bytes, np.ndarray]
+    ) -> Tuple[np.ndarray, Dict[bytes, np.ndarray]]:
+        """为一批文本块获取向量，只对未命中缓存的文本块调用 API（在线程池中执行）
+
+        Args:
+            batch: 文本块列表
+            hashes: 与 batch 对齐的缓存键
+            cached: 已命中缓存的向量
+
+        Returns:
+            (与 batch 对齐的 float32 向量矩阵, 本批新生成的 缓存键 → 向量)
+        """
+        # 同一批内重复的文本块只请求一次
+        missing = {key: chunk for key, chunk in zip(hashes, batch) if key not in cached}
+        fresh = dict(zip(missing, self._get_embeddings(list(missing.values())))) if missing else {}
+        return np.stack([cached[key] if key in cached else fresh[key] for key in hashes]), fresh
 
     # ==================== 文档入库 ====================
     def add_documents(self, texts: List[str], source_name: str = "unknown") -> int:
-        """将文档文本分块、向量化后存入 ChromaDB
+        """将文档文本分块、向量化后存入 ChromaDB（阻塞调用，持有写锁）
 
         Args:
             texts: 原始文本列表（可以是多个文档）
@@ -121,6 +284,11 @@ class RAGService:
         Returns:
             int: 实际入库的文档块数量
         """
+        with self._write_lock:
+            return self._add_documents_locked(texts, source_name)
+
+    def _add_documents_locked(self, texts: List[str], source_name: str) -> int:
+        """add_documents() 的实现，调用方需持有 _write_lock"""
         all_chunks = []
         for text in texts:
             chunks = self._split_text(text)
@@ -130,26 +298,47 @@ class RAGService:
             logger.warning("没有有效的文档内容可以入库")
             return 0
 
-        logger.info(f"正在对 {len(all_chunks)} 个文档块生成 Embedding...")
-        embeddings = self._get_embeddings(all_chunks)
-
-        # 生成唯一 ID（基于现有数量 + 序号，避免冲突）
-        existing_count = self._collection.count()
-        ids = [f"doc_{existing_count + i}" for i in range(len(all_chunks))]
-        metadatas = [{"source": source_name, "chunk_index": i} for i in range(len(all_chunks))]
-
-        self._collection.add(
-            ids=ids,
-            embeddings=embeddings,
-            documents=all_chunks,
-            metadatas=metadatas
-        )
+        # 先查 Embedding 缓存，已入库过的文本块不再调用 API
+        hashes = [self._chunk_hash(chunk) for chunk in all_chunks]
+        cached = self._load_cached_embeddings(hashes)
+        logger.info(f"正在对 {len(all_chunks)} 个文档块生成 Embedding（缓存命中 {len(cached)} 个）...")
+
+        # 按批次并发调用 Embedding API：多个请求的网络往返相互重叠，
+        # 每批完成后立即写入 ChromaDB，写入与其余批次的 Embedding 并行进行。
+        # 各批次独立写入、完成顺序不定，某批失败时已写入的批次会保留，
+        # 因此文档块 ID 使用随机 UUID，而不是基于现有数量推算（部分失败后再上传会生成已存在的 ID，被 ChromaDB 静默丢弃）
+        pool = ThreadPoolExecutor(max_workers=self.EMBED_WORKERS)
+        try:
+            futures = {}
+            for start in range(0, len(all_chunks), self.EMBED_BATCH_SIZE):
+                batch = all_chunks[start:start + self.EMBED_BATCH_SIZE]
+                batch_hashes = hashes[start:start + self.EMBED_BATCH_SIZE]
+                futures[pool.submit(self._embed_batch, batch, batch_hashes, cached)] = (start, batch)
+
+            for future in as_completed(futures):
+                start, batch = futures[future]
+                embeddings, fresh = future.result()
+                self._store_cached_embeddings(fresh)
+                self._collection.add(
+                    ids=[uuid.uuid4().hex for _ in batch],
+                    embeddings=embeddings,
+                    documents=batch,
+                    metadatas=[{"source": source_name, "chunk_index": i} for i in range(start, start + len(batch))]
+                )
+        except BaseException:
+            # 任一批次失败：取消尚未开始的批次，不再等待（并付费）其余 Embedding 请求，直接上报错误
+            pool.shutdown(wait=False, cancel_futures=True)
+            raise
+        else:
+            pool.shutdown()
+        finally:
+            self._cached_count = None   # 集合已变化（包括部分批次失败的情况），下次读取时重新统计
 
         logger.info(f"成功入库 {len(all_chunks)} 个文档块，来源: {source_name}")
         return len(all_chunks)
 
     # ==================== 检索 ====================
-    def retrieve(self, question: str, top_k: int = 3) -> List[Dict[str, Any]]:
+    async def retrieve(self, question: str, top_k: int = 3) -> List[Dict[str, Any]]:
         """检索与问题最相关的文档块
 
         Args:
@@ -159,34 +348,60 @@ class RAGService:
         Returns:
             List[dict]: 检索结果，每项包含 text、source、score 字段
         """
-        if self._collection.count() == 0:
+        # clear() 会在线程池中替换 self._collection，这里只读取一次引用，
+        # 保证 count 与 query 作用于同一个集合
+        collection = self._collection
+        total = self._cached_count
+        if total is None:
+            # ChromaDB 调用是阻塞的，放到线程中执行，避免阻塞事件循环
+            total = await asyncio.to_thread(collection.count)
+            if collection is self._collection:
+                self._cached_count = total
+        if total == 0:
             return []
 
-        # 对问题向量化
-        question_embedding = self._get_embeddings([question])[0]
+        # 对问题向量化（命中缓存时不调用 API）
+        question_embedding = await self._embed_query(question)
 
         # 向量相似度检索
-        results = self._collection.query(
+        results = await asyncio.to_thread(
+            collection.query,
             query_embeddings=[question_embedding],
-            n_results=min(top_k, self._collection.count()),
+            n_results=min(top_k, total),
             include=["documents", "metadatas", "distances"]
         )
 
-        retrieved = []
-        for doc, meta, dist in zip(
-            results["documents"][0],
-            results["metadatas"][0],
-            results["distances"][0]
-        ):
-            retrieved.append({
-                "text": doc,
-                "source": meta.get("source", "unknown"),
-                "score": round(1 - dist, 4)   # 余弦距离转相似度分数
-            })
+        # 余弦距离转相似度分数：减法和取整在 numpy 中整体完成
+        # （使用 float64，避免 float32 取整后 tolist() 出现 0.8234000205993652 这类尾数）
+        distances = np.asarray(results["distances"][0], dtype=np.float64)
+        scores = np.round(1.0 - distances, 4).tolist()
+
+        retrieved = [
+            {"text": doc, "source": meta.get("source", "unknown"), "score": score}
+            for doc, meta, score in zip(
+                results["documents"][0], results["metadatas"][0], scores
+            )
+        ]
 
         return retrieved
 
     # ==================== 生成答案 ====================
+    # 知识库中没有相关文档时的固定回复
+    NO_CONTEXT_ANSWER = "知识库中暂无相关文档，请先上传文档后再提问。"
+
+    def _build_messages(self, question: str, sources: List[Dict[str, Any]]) -> List[Dict[str, str]]:
+        """将检索结果拼接为 Context，构建发送给 LLM 的对话消息"""
+        # 生成器直接交给 join，不再构建中间列表
+        context = "\n\n".join(
+            f"[片段{i}（来自: {src['source']}）]\n{src['text']}"
+            for i, src in enumerate(sources, 1)
+        )
+        user_prompt = self.USER_PROMPT_TEMPLATE.format(context=context, question=question)
+        return [
+            {"role": "system", "content": self.SYSTEM_PROMPT},
+            {"role": "user", "content": user_prompt}
+        ]
+
     async def query_and_generate(self, question: str, top_k: int = 3) -> Dict[str, Any]:
         """RAG 完整流程：检索 → 构建 Context → LLM 生成答案
 
@@ -202,47 +417,24 @@ class RAGService:
             }
         """
         # 1. 检索相关文档
-        sources = self.retrieve(question, top_k=top_k)
+        sources = await self.retrieve(question, top_k=top_k)
 
         if not sources:
             return {
-                "answer": "知识库中暂无相关文档，请先上传文档后再提问。",
+                "answer": self.NO_CONTEXT_ANSWER,
                 "sources": [],
                 "has_context": False
             }
 
         # 2. 构建上下文提示词
-        context_parts = []
-        for i, src in enumerate(sources, 1):
-            context_parts.append(f"[片段{i}（来自: {src['source']}）]\n{src['text']}")
-        context = "\n\n".join(context_parts)
-
-        system_prompt = (
-            "你是一个专业的知识库问答助手。请严格根据以下参考文档回答用户的问题。\n"
-            "如果参考文档中没有足够的信息，请如实说明，不要编造答案。\n"
-            "回答应该简洁、准确、有条理。"
-        )
-
-        user_prompt = f"""参考文档：
-{context}
-
-用户问题：{question}
-
-请基于上述参考文档回答问题："""
-
-        # 3. 调用 LLM 生成答案（在线程池中运行同步 API 调用，避免阻塞事件循环）
-        loop = asyncio.get_event_loop()
-        response = await loop.run_in_executor(
-            None,
-            lambda: self._llm_client.chat.completions.create(
-                model=BackendConfig.MODEL_NAME,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                temperature=0.3,
-                max_tokens=1024
-            )
+        messages = self._build_messages(question, sources)
+
+        # 3. 调用 LLM 生成答案（异步客户端，不阻塞事件循环）
+        response = await self._llm_client.chat.completions.create(
+            model=CONFIG.MODEL_NAME,
+            messages=messages,
+            temperature=0.3,
+            max_tokens=1024
         )
 
         answer = response.choices[0].message.content
@@ -253,20 +445,59 @@ class RAGService:
             "has_context": True
         }
 
+    async def stream_query(self, question: str, top_k: int = 3) -> AsyncIterator[Dict[str, Any]]:
+        """RAG 流式问答：先返回检索结果，再逐段返回 LLM 生成的答案
+
+        与 query_and_generate() 的检索和提示词完全相同，区别在于 LLM 以流式（SSE）生成，
+        调用方可以在第一个 token 到达时就开始展示答案，而不必等待完整生成结束。
+
+        Args:
+            question: 用户问题
+            top_k: 检索的最大文档块数量
+
+        Yields:
+            dict: 第一条为 {"sources": List[dict], "has_context": bool}，
+                  之后每条为 {"delta": str}（答案的增量文本）
+        """
+        sources = await self.retrieve(question, top_k=top_k)
+        yield {"sources": sources, "has_context": bool(sources)}
+
+        if not sources:
+            yield {"delta": self.NO_CONTEXT_ANSWER}
+            return
+
+        stream = await self._llm_client.chat.completions.create(
+            model=CONFIG.MODEL_NAME,
+            messages=self._build_messages(question, sources),
+            temperature=0.3,
+            max_tokens=1024,
+            stream=True
+        )
+        async for chunk in stream:
+            # 部分服务商会在流末尾发送不含 choices 的用量统计块
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield {"delta": chunk.choices[0].delta.content}
+
     # ==================== 管理操作 ====================
     def clear(self) -> int:
-        """清空向量库中的所有文档
+        """清空向量库中的所有文档（阻塞调用，持有写锁）
 
         Returns:
             int: 清空前的文档块数量
         """
-        count = self._collection.count()
+        with self._write_lock:
+            return self._clear_locked()
+
+    def _clear_locked(self) -> int:
+        """clear() 的实现，调用方需持有 _write_lock"""
+        count = self._count()
         # 删除 collection 并重建（ChromaDB 没有直接的 clear 接口）
         self._chroma_client.delete_collection(self.COLLECTION_NAME)
         self._collection = self._chroma_client.get_or_create_collection(
             name=self.COLLECTION_NAME,
             metadata={"hnsw:space": "cosine"}
         )
+        self._cached_count = 0
         logger.info(f"知识库已清空，共删除 {count} 个文档块")
         return count
 
@@ -277,7 +508,7 @@ class RAGService:
             dict: 包含 total_chunks 字段的统计信息
         """
         return {
-            "total_chunks": self._collection.count(),
-            "embedding_model": BackendConfig.EMBEDDING_MODEL,
-            "db_path": BackendConfig.CHROMA_DB_PATH
+            "total_chunks": self._count(),
+            "embedding_model": CONFIG.EMBEDDING_MODEL,
+            "db_path": CONFIG.CHROMA_DB_PATH
         }
@@ -12,8 +12,18 @@ Streamlit 多页面应用结构说明：
 - frontend/pages/ 目录下的文件自动注册为子页面
 - 文件名格式「数字_emoji_名称.py」决定页面在侧边栏的排列顺序和显示名称
 """
+import os
+import sys
+
 import streamlit as st
 
+# 将项目根目录添加到 Python 路径（Streamlit 的工作目录可能不是项目根目录）
+# 每次页面重跑都会重新执行本文件，先检查再插入，避免 sys.path 无限增长
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+from frontend.utils.api_client import get_api_client
+
 # ==================== 页面配置 ====================
 # 必须在所有 Streamlit 命令之前调用 set_page_config()
 st.set_page_config(
@@ -23,6 +33,7 @@ st.set_page_config(
     initial_sidebar_state="expanded"        # 侧边栏默认展开
 )
 
+
 # ==================== 主页面内容 ====================
 st.title("🛡️ 多智能体安全分析系统")
 st.markdown("---")
@@ -64,15 +75,8 @@ st.markdown("""
 with st.sidebar:
     st.header("系统信息")
     
-    # 动态导入：将项目根目录添加到 Python 路径
-    # 这是因为 Streamlit 的工作目录可能不是项目根目录
-    import sys
-    import os
-    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-    from frontend.utils.api_client import APIClient
-    
-    # 创建前端 API 客户端实例，连接到本地后端服务
-    api_client = APIClient("http://localhost:8000")
+    # 前端 API 客户端实例（由 cache_resource 缓存，连接到本地后端服务）
+    api_client = get_api_client()
     
     # 后端服务连接状态检测
     # 通过调用 /api/health 端点判断后端是否在线
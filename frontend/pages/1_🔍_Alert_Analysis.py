@@ -22,8 +22,11 @@ import sys
 import os
 
 # 将项目根目录添加到 Python 路径，以便导入 frontend.utils 模块
-sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
-from frontend.utils.api_client import APIClient
+# 每次页面重跑都会重新执行本文件，先检查再插入，避免 sys.path 无限增长
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+from frontend.utils.api_client import get_api_client
 
 # 页面配置：设置标题和布局
 st.set_page_config(page_title="告警分析", page_icon="🔍", layout="wide")
@@ -31,8 +34,9 @@ st.set_page_config(page_title="告警分析", page_icon="🔍", layout="wide")
 st.title("🔍 安全告警分析")
 st.markdown("---")
 
-# 初始化前端 API 客户端，用于与后端 FastAPI 服务通信
-api_client = APIClient("http://localhost:8000")
+# 获取前端 API 客户端（全局共享实例），用于与后端 FastAPI 服务通信
+api_client = get_api_client()
+
 
 # 后端连接检查：如果后端不可用，显示错误提示并阻止后续操作
 if not api_client.health_check():
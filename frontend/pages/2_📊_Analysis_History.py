@@ -17,8 +17,11 @@ import sys
 import os
 
 # 将项目根目录添加到 Python 路径
-sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
-from frontend.utils.api_client import APIClient
+# 每次页面重跑都会重新执行本文件，先检查再插入，避免 sys.path 无限增长
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+from frontend.utils.api_client import get_api_client
 
 # 页面配置
 st.set_page_config(page_title="分析历史", page_icon="📊", layout="wide")
@@ -26,8 +29,9 @@ st.set_page_config(page_title="分析历史", page_icon="📊", layout="wide")
 st.title("📊 分析历史记录")
 st.markdown("---")
 
-# 初始化 API 客户端
-api_client = APIClient("http://localhost:8000")
+# 获取 API 客户端（全局共享实例）
+api_client = get_api_client()
+
 
 # 后端连接检查
 if not api_client.health_check():
@@ -59,11 +63,10 @@ with filter_col3:
 # ==================== 数据加载和展示 ====================
 try:
     with st.spinner("正在加载历史记录..."):
-        # 调用后端 GET /api/history 接口
+        # 调用后端 GET /api/history 接口（相同过滤条件 10 秒内复用缓存，提交新分析后自动失效）
         # 将"全部"选项转换为 None（表示不过滤）
         history = api_client.get_analysis_history(
             limit=limit,
-            offset=0,
             threat_level=None if threat_level_filter == "全部" else threat_level_filter,
             attack_type=None if attack_type_filter == "全部" else attack_type_filter,
         )
@@ -74,22 +77,18 @@ try:
     else:
         st.success(f"✅ 找到 {len(history)} 条记录")
 
-        # 将历史记录列表转换为 Pandas DataFrame 便于展示
-        df = pd.DataFrame(history)
-        # 将 Unix 时间戳（秒）转换为 datetime 类型，unit='s' 指定时间戳单位
-        df['timestamp'] = pd.to_datetime(df['timestamp'], unit='s')
-
         # ---------- 统计概览（3列布局） ----------
+        # 记录数最多 200 条，直接遍历列表计算，比构建 DataFrame 再聚合更快
         stat_cols = st.columns(3)
         with stat_cols[0]:
-            st.metric("总记录数", len(df))
+            st.metric("总记录数", len(history))
         with stat_cols[1]:
             # 统计高危告警数量
-            high_risk_count = len(df[df['threat_level'] == '高危'])
+            high_risk_count = sum(1 for r in history if r['threat_level'] == '高危')
             st.metric("高危告警", high_risk_count)
         with stat_cols[2]:
             # 计算所有记录的平均风险评分
-            avg_risk = df['risk_score'].mean()
+            avg_risk = sum(r['risk_score'] for r in history) / len(history)
             st.metric("平均风险分", f"{avg_risk:.1f}/10")
 
         st.markdown("---")
@@ -97,12 +96,20 @@ try:
         # ---------- 历史记录数据表格 ----------
         st.subheader("📋 历史记录列表")
 
-        # 选取展示列，并创建副本避免修改原始数据
-        display_df = df[['analysis_id', 'attack_type', 'threat_level', 'risk_score', 'timestamp']].copy()
-        # 截断 UUID 只显示前 8 位 + "..."
-        display_df['analysis_id'] = display_df['analysis_id'].str[:8] + "..."
-        # 中文列名映射
-        display_df.columns = ['分析ID', '攻击类型', '威胁等级', '风险评分', '时间']
+        # 直接构建展示行：截断 UUID（只显示前 8 位 + "..."）并使用中文列名，
+        # 避免在 DataFrame 上做 Series 级字符串运算和列重命名
+        display_df = pd.DataFrame([
+            {
+                '分析ID': r['analysis_id'][:8] + "...",
+                '攻击类型': r['attack_type'],
+                '威胁等级': r['threat_level'],
+                '风险评分': r['risk_score'],
+                '时间': r['timestamp'],
+            }
+            for r in history
+        ])
+        # 将 Unix 时间戳（秒）转换为 datetime 类型，unit='s' 指定时间戳单位
+        display_df['时间'] = pd.to_datetime(display_df['时间'], unit='s')
 
         # 自定义列格式：数字格式和日期格式
         column_config = {
@@ -5,15 +5,18 @@ RAG 知识库问答页面（RAG Q&A Page）
 功能：
 1. 文档上传区：粘贴文本 或 上传 .txt/.md 文件，点击"入库"
 2. 知识库状态：显示当前已存储的文档块数量
-3. 问答区：输入问题，LLM 基于知识库内容作答，并展示检索到的原文片段
+3. 问答区：输入问题，LLM 基于知识库内容流式作答，并展示检索到的原文片段
 4. 清库按钮：清空所有已存储的文档
 """
 import streamlit as st
 import sys
 import os
 
-sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
-from frontend.utils.api_client import APIClient
+# 每次页面重跑都会重新执行本文件，先检查再插入，避免 sys.path 无限增长
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+from frontend.utils.api_client import get_api_client
 
 st.set_page_config(page_title="RAG 知识库问答", page_icon="📚", layout="wide")
 
@@ -21,7 +24,33 @@ st.title("📚 RAG 知识库问答")
 st.markdown("基于本地向量库的检索增强生成（RAG）问答系统，使用 `Qwen/Qwen3-Embedding-8B` 进行语义检索。")
 st.markdown("---")
 
-api_client = APIClient("http://localhost:8000")
+api_client = get_api_client()
+
+# 问答记录默认展示的最大条数（最新的在上方）
+MAX_VISIBLE_MESSAGES = 20
+
+
+def _render_message(msg):
+    """渲染一条问答记录：问题、答案以及折叠的参考文档片段"""
+    with st.container(border=True):
+        st.markdown(f"**🙋 问：** {msg['question']}")
+
+        if msg["has_context"]:
+            st.markdown(f"**🤖 答：**\n\n{msg['answer']}")
+
+            # 折叠展示检索到的原文片段
+            with st.expander(f"📄 查看参考文档（{len(msg['sources'])} 个片段）"):
+                for j, src in enumerate(msg["sources"], 1):
+                    score_pct = f"{src['score'] * 100:.1f}%"
+                    st.markdown(
+                        f"**片段 {j}** · 来源: `{src['source']}` · 相似度: `{score_pct}`"
+                    )
+                    st.text(src["text"])
+                    if j < len(msg["sources"]):
+                        st.divider()
+        else:
+            st.info(msg["answer"])
+
 
 # 后端连接检查
 if not api_client.health_check():
@@ -112,7 +141,13 @@ with col_upload:
 
         if uploaded_file is not None:
             try:
-                file_content = uploaded_file.read().decode("utf-8")
+                # 页面每次重跑都会拿到同一个上传文件，按 file_id 缓存解码结果，
+                # 只在换了文件时才重新读取和解码（重新上传同名同大小的文件也会得到新的 file_id）
+                file_key = uploaded_file.file_id
+                if st.session_state.get("rag_file_key") != file_key:
+                    st.session_state.rag_file_content = uploaded_file.getvalue().decode("utf-8")
+                    st.session_state.rag_file_key = file_key
+                file_content = st.session_state.rag_file_content
                 st.text_area(
                     "文件预览（前 500 字符）",
                     value=file_content[:500] + ("..." if len(file_content) > 500 else ""),
@@ -174,45 +209,46 @@ with col_qa:
         if not question.strip():
             st.warning("请先输入问题")
         else:
-            with st.spinner("正在检索知识库并生成答案..."):
-                try:
-                    result = api_client.rag_query(question=question, top_k=top_k)
-
-                    # 追加到对话历史
-                    st.session_state.rag_messages.append({
-                        "question": question,
-                        "answer": result["answer"],
-                        "sources": result["sources"],
-                        "has_context": result["has_context"]
-                    })
-                except Exception as e:
-                    st.error(f"❌ 问答失败: {e}")
-                    st.exception(e)
+            # 流式问答：检索完成后先拿到参考片段，答案随 LLM 生成逐段显示；
+            # 生成结束后清掉临时区域，由下方的问答记录统一展示
+            placeholder = st.empty()
+            try:
+                with st.spinner("正在检索知识库..."):
+                    events = api_client.rag_query_stream(question=question, top_k=top_k)
+                    header = next(events)   # 第一条事件：{sources, has_context}
+
+                with placeholder.container(border=True):
+                    st.markdown(f"**🙋 问：** {question}")
+                    answer = st.write_stream(event["delta"] for event in events)
+                placeholder.empty()
+
+                # 追加到对话历史
+                st.session_state.rag_messages.append({
+                    "question": question,
+                    "answer": answer,
+                    "sources": header["sources"],
+                    "has_context": header["has_context"]
+                })
+            except Exception as e:
+                placeholder.empty()
+                st.error(f"❌ 问答失败: {e}")
+                st.exception(e)
 
     # 展示对话历史（最新的在上方）
     if st.session_state.rag_messages:
         st.markdown("---")
         st.subheader("📝 问答记录")
 
-        for i, msg in enumerate(reversed(st.session_state.rag_messages)):
-            with st.container(border=True):
-                st.markdown(f"**🙋 问：** {msg['question']}")
+        # 只渲染最近 MAX_VISIBLE_MESSAGES 条记录，更早的记录需手动展开后才渲染，
+        # 避免长对话中每次控件交互都重新渲染全部历史
+        messages = st.session_state.rag_messages
+        for msg in reversed(messages[-MAX_VISIBLE_MESSAGES:]):
+            _render_message(msg)
 
-                if msg["has_context"]:
-                    st.markdown(f"**🤖 答：**\n\n{msg['answer']}")
-
-                    # 折叠展示检索到的原文片段
-                    with st.expander(f"📄 查看参考文档（{len(msg['sources'])} 个片段）"):
-                        for j, src in enumerate(msg["sources"], 1):
-                            score_pct = f"{src['score'] * 100:.1f}%"
-                            st.markdown(
-                                f"**片段 {j}** · 来源: `{src['source']}` · 相似度: `{score_pct}`"
-                            )
-                            st.text(src["text"])
-                            if j < len(msg["sources"]):
-                                st.divider()
-                else:
-                    st.info(msg["answer"])
+        hidden_count = len(messages) - MAX_VISIBLE_MESSAGES
+        if hidden_count > 0 and st.toggle(f"显示更早的 {hidden_count} 条记录", key="rag_show_older"):
+            for msg in reversed(messages[:hidden_count]):
+                _render_message(msg)
 
         # 清空对话记录按钮
         if st.button("🔄 清空对话记录", use_container_width=True):
@@ -21,8 +21,11 @@ import sys
 import os
 
 # 将项目根目录添加到 Python 路径
-sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
-from frontend.utils.api_client import APIClient
+# 每次页面重跑都会重新执行本文件，先检查再插入，避免 sys.path 无限增长
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+from frontend.utils.api_client import get_api_client
 
 # 页面配置
 st.set_page_config(page_title="系统仪表板", page_icon="📈", layout="wide")
@@ -30,16 +33,91 @@ st.set_page_config(page_title="系统仪表板", page_icon="📈", layout="wide"
 st.title("📈 系统仪表板")
 st.markdown("---")
 
-# 初始化 API 客户端
-api_client = APIClient("http://localhost:8000")
+# 获取 API 客户端（全局共享实例）
+api_client = get_api_client()
+
+# ==================== 图表构建（按数据缓存） ====================
+# 每次控件交互都会重跑页面，而统计数据通常没有变化。
+# 以分布数据的 (键, 值) 元组为缓存键缓存构建好的 Figure，数据相同时跳过 Plotly 的图表构建和校验。
+# 使用 cache_resource 直接共享 Figure 对象（st.plotly_chart 不会修改传入的图表），省去序列化复制。
+
+# 预定义各威胁等级的颜色方案
+# 从红色（严重）到绿色（低危），直观表达风险程度
+THREAT_COLORS = {
+    '严重': '#D32F2F',    # 深红色
+    '高危': '#F57C00',    # 橙色
+    '中危': '#FBC02D',    # 黄色
+    '低危': '#388E3C',    # 绿色
+    '未知': '#757575'     # 灰色
+}
+
+
+@st.cache_resource(max_entries=32, show_spinner=False)
+def _threat_pie(threat_items: tuple) -> go.Figure:
+    """构建威胁等级分布环形饼图
+
+    Args:
+        threat_items: ((威胁等级, 数量), ...)
+    """
+    labels = [label for label, _ in threat_items]
+    values = [value for _, value in threat_items]
+    # 根据威胁等级匹配预定义颜色
+    pie_colors = [THREAT_COLORS.get(label, '#757575') for label in labels]
+    
+    # 使用 Plotly Graph Objects 创建环形饼图
+    # hole=0.3 表示中心留30%的空洞（环形图效果）
+    fig = go.Figure(data=[go.Pie(
+        labels=labels,
+        values=values,
+        marker=dict(colors=pie_colors),
+        hole=0.3        # 中心空洞比例，0为普通饼图，>0为环形图
+    )])
+    
+    fig.update_layout(
+        height=350,
+        showlegend=True,
+        margin=dict(t=30, b=0, l=0, r=0)    # 紧凑的边距
+    )
+    return fig
+
+
+@st.cache_resource(max_entries=32, show_spinner=False)
+def _attack_bar(attack_items: tuple) -> go.Figure:
+    """构建攻击类型分布柱状图
+
+    Args:
+        attack_items: ((攻击类型, 数量), ...)
+    """
+    names = [name for name, _ in attack_items]
+    counts = [count for _, count in attack_items]
+    
+    # 使用 Plotly Express 创建柱状图
+    # color 使用数值映射颜色深浅，color_continuous_scale='Reds' 使用红色色阶
+    fig = px.bar(
+        x=names,
+        y=counts,
+        labels={'x': '攻击类型', 'y': '数量'},
+        color=counts,
+        color_continuous_scale='Reds'    # 红色渐变色阶：值越大颜色越深
+    )
+    
+    fig.update_layout(
+        height=350,
+        showlegend=False,                     # 隐藏图例（颜色条已经表达了信息）
+        xaxis_tickangle=-45,                  # X轴标签旋转-45度，防止重叠
+        margin=dict(t=30, b=80, l=0, r=0)    # 底部留更多空间给旋转的标签
+    )
+    return fig
+
 
 # 后端连接检查
 if not api_client.health_check():
     st.error("⚠️ 无法连接到后端服务")
     st.stop()
 
-# 手动刷新按钮：点击后触发页面重渲染，重新获取最新数据
+# 手动刷新按钮：清除统计缓存后触发页面重渲染，重新获取最新数据
 if st.button("🔄 刷新数据", use_container_width=False):
+    api_client.clear_stats_cache()
     st.rerun()
 
 # ==================== 数据加载和展示 ====================
@@ -90,37 +168,8 @@ try:
         
         threat_dist = stats['threat_level_distribution']
         if threat_dist:
-            # 预定义各威胁等级的颜色方案
-            # 从红色（严重）到绿色（低危），直观表达风险程度
-            colors = {
-                '严重': '#D32F2F',    # 深红色
-                '高危': '#F57C00',    # 橙色
-                '中危': '#FBC02D',    # 黄色
-                '低危': '#388E3C',    # 绿色
-                '未知': '#757575'     # 灰色
-            }
-            
-            labels = list(threat_dist.keys())
-            values = list(threat_dist.values())
-            # 根据威胁等级匹配预定义颜色
-            pie_colors = [colors.get(label, '#757575') for label in labels]
-            
-            # 使用 Plotly Graph Objects 创建环形饼图
-            # hole=0.3 表示中心留30%的空洞（环形图效果）
-            fig = go.Figure(data=[go.Pie(
-                labels=labels,
-                values=values,
-                marker=dict(colors=pie_colors),
-                hole=0.3        # 中心空洞比例，0为普通饼图，>0为环形图
-            )])
-            
-            fig.update_layout(
-                height=350,
-                showlegend=True,
-                margin=dict(t=30, b=0, l=0, r=0)    # 紧凑的边距
-            )
-            
-            st.plotly_chart(fig, use_container_width=True)
+            # 统计数据未变化时直接复用已构建的图表对象
+            st.plotly_chart(_threat_pie(tuple(threat_dist.items())), use_container_width=True)
         else:
             st.info("暂无数据")
     
@@ -130,24 +179,7 @@ try:
         
         attack_dist = stats['attack_type_distribution']
         if attack_dist:
-            # 使用 Plotly Express 创建柱状图
-            # color 使用数值映射颜色深浅，color_continuous_scale='Reds' 使用红色色阶
-            fig = px.bar(
-                x=list(attack_dist.keys()),
-                y=list(attack_dist.values()),
-                labels={'x': '攻击类型', 'y': '数量'},
-                color=list(attack_dist.values()),
-                color_continuous_scale='Reds'    # 红色渐变色阶：值越大颜色越深
-            )
-            
-            fig.update_layout(
-                height=350,
-                showlegend=False,                     # 隐藏图例（颜色条已经表达了信息）
-                xaxis_tickangle=-45,                  # X轴标签旋转-45度，防止重叠
-                margin=dict(t=30, b=80, l=0, r=0)    # 底部留更多空间给旋转的标签
-            )
-            
-            st.plotly_chart(fig, use_container_width=True)
+            st.plotly_chart(_attack_bar(tuple(attack_dist.items())), use_container_width=True)
         else:
             st.info("暂无数据")
     
@@ -10,17 +10,76 @@
 2. analyze_alert(): 提交告警进行分析
 3. get_analysis_history(): 获取分析历史记录
 4. get_stats(): 获取系统统计数据
+5. rag_upload() / rag_query() / rag_query_stream() / rag_clear() / rag_stats(): RAG 知识库接口
+
+连接管理：
+- 请求通过 requests.Session 发出，底层连接池保持 HTTP keep-alive
+- 各页面通过 get_api_client() 获取由 st.cache_resource 缓存的同一个客户端实例；
+  requests.Session 不是线程安全的，而不同浏览器会话的脚本在各自的线程中并发运行，
+  因此会话保存在 st.session_state 中，每个浏览器会话一个；
+  同一会话内的脚本按顺序执行，重跑、切换页面时复用已建立的 TCP 连接
+- GET/DELETE 等幂等请求在 502/503/504 时自动重试（最多 2 次，指数退避）；
+  POST 不重试，避免重复提交分析任务
 
 错误处理策略：
 - HTTP 5xx 错误：抛出"服务器错误"异常
 - HTTP 4xx 错误：提取 detail 字段抛出"请求错误"异常
 - 网络连接失败：health_check 返回 False，其他方法向上抛出异常
 """
+import orjson
 import requests
-from typing import Dict, Any, List, Optional
+import streamlit as st
+from urllib.parse import urlencode
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from typing import Dict, Any, Iterator, List, Optional
 from loguru import logger
 
 
+@st.cache_data(ttl=5, show_spinner=False)
+def _cached_health(_client: "APIClient", base_url: str) -> bool:
+    """按后端地址缓存健康检查结果
+
+    Streamlit 每次控件交互都会重跑整个页面脚本，各页面顶部的健康检查随之重复执行。
+    结果缓存 5 秒，期间所有页面、所有重跑共用一次检查。
+    使用较短的超时（2 秒），后端不可用时尽快返回。
+    与 _cached_get_json 一样，_client 参数不参与缓存键计算。
+
+    Args:
+        _client: 发起请求的 APIClient（复用其会话）
+        base_url: 后端服务的基础 URL（作为缓存键）
+
+    Returns:
+        bool: 后端在线返回 True，否则返回 False
+    """
+    try:
+        response = _client.session.get(f"{base_url}/api/health", timeout=2)
+        return response.status_code == 200
+    except requests.exceptions.RequestException:
+        # 连接失败（超时、拒绝连接等）直接返回 False
+        return False
+
+
+@st.cache_data(ttl=10, show_spinner=False)
+def _cached_get_json(_client: "APIClient", url: str) -> Any:
+    """按 URL 缓存统计类和历史记录 GET 接口的响应（10 秒）
+
+    统计数据变化缓慢，但仪表板、历史记录和 RAG 页面每次控件交互都会重跑并重新拉取。
+    提交新分析后由 clear_stats_cache() 整体失效。
+    以下划线开头的 _client 参数不参与 Streamlit 的缓存键计算，缓存键只有 url。
+    请求失败时异常直接抛出，不会被缓存。
+
+    Args:
+        _client: 发起请求的 APIClient（复用其会话和响应处理）
+        url: 完整的接口 URL（作为缓存键）
+
+    Returns:
+        响应体的 JSON 数据
+    """
+    response = _client.session.get(url, timeout=_client.timeout)
+    return _client._handle_response(response)
+
+
 class APIClient:
     """FastAPI 后端客户端
     
@@ -28,6 +87,9 @@ class APIClient:
     所有方法都是同步的，适配 Streamlit 的同步运行模型。
     """
     
+    # st.session_state 中保存当前浏览器会话 requests.Session 的键
+    SESSION_STATE_KEY = "_api_client_session"
+    
     def __init__(self, base_url: str = "http://localhost:8000"):
         """初始化 API 客户端
         
@@ -37,15 +99,43 @@ class APIClient:
         self.base_url = base_url.rstrip("/")   # 去除尾部斜杠，避免拼接 URL 时出现双斜杠
         self.timeout = 60                       # 请求超时时间（秒），分析可能需要较长时间
     
+    @property
+    def session(self) -> requests.Session:
+        """当前浏览器会话的持久会话（首次访问时创建）
+        
+        复用连接池中的 keep-alive 连接，省去每次请求的 TCP 握手。
+        requests.Session 不是线程安全的，而客户端实例被所有浏览器会话共享，
+        因此 requests.Session 保存在各自的 st.session_state 中，不同会话的并发请求互不干扰。
+        """
+        session = st.session_state.get(self.SESSION_STATE_KEY)
+        if session is None:
+            session = st.session_state[self.SESSION_STATE_KEY] = self._new_session()
+        return session
+    
+    @staticmethod
+    def _new_session() -> requests.Session:
+        """创建带连接池和幂等请求重试的会话"""
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=4,
+            pool_maxsize=10,
+            # raise_on_status=False：重试用尽后返回最后一次响应，仍由 _handle_response 统一报错
+            max_retries=Retry(total=2, backoff_factor=0.2,
+                              status_forcelist=[502, 503, 504], raise_on_status=False)
+        )
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+    
     def _handle_response(self, response: requests.Response) -> Any:
         """统一处理 API 响应
         
         检查 HTTP 状态码，成功时返回 JSON 数据，失败时抛出友好的异常信息。
         
         错误处理逻辑：
-        - 2xx 状态码：返回 response.json()
+        - 2xx 状态码：用 orjson 直接解析响应字节并返回
         - 5xx 状态码：抛出"服务器错误"，说明是后端问题
-        - 4xx 状态码：从响应体中提取 detail 字段，提供更具体的错误信息
+        - 4xx 状态码：JSON 响应提取 detail 字段，其他响应截取前 200 个字符，提供更具体的错误信息
         
         Args:
             response: requests 库的响应对象
@@ -58,35 +148,55 @@ class APIClient:
         """
         try:
             response.raise_for_status()      # 非 2xx 状态码时抛出 HTTPError
-            return response.json()
+            return orjson.loads(response.content)
         except requests.exceptions.HTTPError as e:
             logger.error(f"API请求失败: {e}")
             if response.status_code >= 500:
                 raise Exception(f"服务器错误: {response.status_code}")
             elif response.status_code >= 400:
-                # 尝试从响应体中提取 FastAPI 的 detail 错误信息
-                detail = response.json().get("detail", "未知错误")
+                # JSON 响应中提取 FastAPI 的 detail 错误信息；
+                # 非 JSON 响应（如代理返回的 HTML 错误页）直接截取正文，避免解析失败掩盖原始错误
+                if "json" in response.headers.get("content-type", ""):
+                    detail = orjson.loads(response.content).get("detail", "未知错误")
+                else:
+                    detail = response.text[:200] or "未知错误"
                 raise Exception(f"请求错误: {detail}")
             raise
         except Exception as e:
             logger.error(f"处理响应失败: {e}")
             raise
     
+    def _post_json(self, url: str, payload: Any, headers: Optional[Dict[str, str]] = None,
+                   **kwargs) -> requests.Response:
+        """发送 JSON 请求体的 POST 请求
+        
+        用 orjson 直接序列化为 UTF-8 字节作为请求体，代替 requests 的 json= 参数
+        （标准库 json.dumps 生成字符串后还要再编码一次）。
+        
+        Args:
+            url: 请求 URL
+            payload: 可 JSON 序列化的请求数据
+            headers: 额外的请求头（与 Content-Type 合并）
+            **kwargs: 透传给 session.post() 的其他参数（如 stream）
+        """
+        return self.session.post(
+            url,
+            data=orjson.dumps(payload),
+            headers={"Content-Type": "application/json", **(headers or {})},
+            timeout=self.timeout,
+            **kwargs
+        )
+    
     def health_check(self) -> bool:
         """健康检查 - 检测后端服务是否在线
         
         调用 GET /api/health 端点，通过状态码判断后端是否正常运行。
-        使用较短的超时时间（5秒），快速返回结果。
+        结果由 _cached_health() 缓存 5 秒，页面重跑时不会重复请求后端。
         
         Returns:
             bool: 后端在线返回 True，否则返回 False
         """
-        try:
-            response = requests.get(f"{self.base_url}/api/health", timeout=5)
-            return response.status_code == 200
-        except:
-            # 连接失败（超时、拒绝连接等）直接返回 False
-            return False
+        return _cached_health(self, self.base_url)
     
     def analyze_alert(self, alert_data: Dict[str, Any]) -> Dict[str, Any]:
         """提交安全告警进行分析
@@ -100,8 +210,10 @@ class APIClient:
             dict: 完整的分析结果（AnalysisResult 格式）
         """
         url = f"{self.base_url}/api/analyze"
-        response = requests.post(url, json=alert_data, timeout=self.timeout)
-        return self._handle_response(response)
+        response = self._post_json(url, alert_data)
+        result = self._handle_response(response)
+        self.clear_stats_cache()    # 新的分析结果改变了统计数据和历史记录
+        return result
     
     def get_analysis_history(
         self,
@@ -114,6 +226,8 @@ class APIClient:
         
         发送 GET 请求到 /api/history，支持通过 Query 参数进行过滤。
         
+        结果按完整 URL（含查询参数）缓存 10 秒，提交新分析后自动失效。
+        
         Args:
             limit: 返回的最大记录数
             offset: 分页偏移量
@@ -123,7 +237,6 @@ class APIClient:
         Returns:
             List[dict]: 历史记录列表（AnalysisHistory 格式）
         """
-        url = f"{self.base_url}/api/history"
         # 构建查询参数，只在有值时才添加过滤参数
         params = {"limit": limit, "offset": offset}
         if threat_level:
@@ -131,20 +244,24 @@ class APIClient:
         if attack_type:
             params["attack_type"] = attack_type
         
-        response = requests.get(url, params=params, timeout=self.timeout)
-        return self._handle_response(response)
+        return _cached_get_json(self, f"{self.base_url}/api/history?{urlencode(params)}")
     
     def get_stats(self) -> Dict[str, Any]:
         """获取系统统计信息
         
         发送 GET 请求到 /api/stats，获取威胁等级分布、攻击类型分布等统计数据。
         
+        结果缓存 10 秒，提交新分析后自动失效；需要立即刷新时调用 clear_stats_cache()。
+        
         Returns:
             dict: 系统统计数据（SystemStats 格式）
         """
-        url = f"{self.base_url}/api/stats"
-        response = requests.get(url, timeout=self.timeout)
-        return self._handle_response(response)
+        return _cached_get_json(self, f"{self.base_url}/api/stats")
+    
+    @staticmethod
+    def clear_stats_cache():
+        """清除 get_stats() / get_analysis_history() / rag_stats() 的缓存，下次调用时重新请求后端"""
+        _cached_get_json.clear()
 
     # ==================== RAG 知识库 API ====================
 
@@ -162,8 +279,10 @@ class APIClient:
         """
         url = f"{self.base_url}/api/rag/upload"
         payload = {"texts": texts, "source_name": source_name}
-        response = requests.post(url, json=payload, timeout=self.timeout)
-        return self._handle_response(response)
+        response = self._post_json(url, payload)
+        result = self._handle_response(response)
+        self.clear_stats_cache()    # 文档块数量已变化
+        return result
 
     def rag_query(self, question: str, top_k: int = 3) -> Dict[str, Any]:
         """向知识库提问，获取基于检索的 LLM 答案
@@ -179,9 +298,39 @@ class APIClient:
         """
         url = f"{self.base_url}/api/rag/query"
         payload = {"question": question, "top_k": top_k}
-        response = requests.post(url, json=payload, timeout=self.timeout)
+        response = self._post_json(url, payload)
         return self._handle_response(response)
 
+    def rag_query_stream(self, question: str, top_k: int = 3) -> Iterator[Dict[str, Any]]:
+        """向知识库提问，以流式方式逐段获取 LLM 答案
+
+        发送 POST 请求到 /api/rag/query/stream，逐行读取 NDJSON 响应。
+        请求头声明 Accept-Encoding: identity，避免后端 GZip 压缩缓冲答案增量。
+
+        Args:
+            question: 用户问题
+            top_k: 检索的最大文档块数量
+
+        Yields:
+            dict: 第一条为 {sources, has_context}，之后每条为 {delta}
+
+        Raises:
+            Exception: HTTP 错误，或后端在生成过程中返回 {"error": ...} 时抛出
+        """
+        url = f"{self.base_url}/api/rag/query/stream"
+        payload = {"question": question, "top_k": top_k}
+        with self._post_json(url, payload, stream=True,
+                             headers={"Accept-Encoding": "identity"}) as response:
+            if not response.ok:
+                self._handle_response(response)     # 统一转换为友好的异常信息
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                event = orjson.loads(line)
+                if "error" in event:
+                    raise Exception(event["error"])
+                yield event
+
     def rag_clear(self) -> Dict[str, Any]:
         """清空 RAG 知识库
 
@@ -191,16 +340,28 @@ class APIClient:
             dict: {success, deleted_chunks, message}
         """
         url = f"{self.base_url}/api/rag/clear"
-        response = requests.delete(url, timeout=self.timeout)
-        return self._handle_response(response)
+        response = self.session.delete(url, timeout=self.timeout)
+        result = self._handle_response(response)
+        self.clear_stats_cache()    # 文档块数量已变化
+        return result
 
     def rag_stats(self) -> Dict[str, Any]:
         """获取 RAG 知识库统计信息
 
+        结果缓存 10 秒，上传或清空知识库后自动失效。
+
         Returns:
             dict: {total_chunks, embedding_model, db_path}
         """
-        url = f"{self.base_url}/api/rag/stats"
-        response = requests.get(url, timeout=self.timeout)
-        return self._handle_response(response)
+        return _cached_get_json(self, f"{self.base_url}/api/rag/stats")
 
+
+@st.cache_resource
+def get_api_client() -> APIClient:
+    """获取前端 API 客户端（跨重跑、页面和会话共享同一个实例）
+
+    Streamlit 每次重跑都会重新执行页面脚本，若在页面顶层直接创建 APIClient，
+    每次重跑都会新建一个 requests.Session 及其连接池且从不关闭。
+    实例被多个浏览器会话同时使用，requests.Session 按浏览器会话隔离（见 APIClient.session）。
+    """
+    return APIClient("http://localhost:8000")
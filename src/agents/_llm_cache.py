@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+LLM 响应缓存（LLM Response Cache）
+
+安全告警中同一载荷经常在多次扫描中重复出现，相同告警每次都重新请求 LLM
+会白白消耗一次完整的网络往返和 token 配额。本模块在专家智能体和 LLM 之间
+提供一个进程内的 LRU + TTL 缓存：
+
+- 缓存键：完整 Prompt 的 SHA-256 摘要。Prompt 由专家模板和
+  (attack_type, payload[:500], source_ip, target_ip) 渲染而成，
+  因此摘要天然区分了专家类型和告警内容
+- 缓存值：(解析后的分析结果, 过期时间戳)
+- 淘汰策略：超过容量时淘汰最久未使用的条目；读取时发现过期则丢弃
+
+配置（环境变量）：
+- LLM_CACHE_TTL: 缓存有效期（秒），默认 600；设为 0 时关闭缓存
+- LLM_CACHE_SIZE: 最大缓存条目数，默认 1024
+
+缓存只在事件循环线程中访问（专家智能体的 analyze() 是协程），无需加锁。
+"""
+import copy
+import hashlib
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from dotenv import load_dotenv
+
+# 加载 .env 文件中的缓存配置
+load_dotenv()
+
+
+class LLMResponseCache:
+    """基于 OrderedDict 的 LRU + TTL 缓存
+
+    OrderedDict 的插入顺序即使用顺序：命中时 move_to_end() 移到末尾，
+    超出容量时从头部 popitem(last=False) 淘汰最久未使用的条目。
+    """
+
+    def __init__(self, ttl: float, max_size: int):
+        """初始化缓存
+
+        Args:
+            ttl: 缓存有效期（秒），小于等于 0 时缓存不生效
+            max_size: 最大缓存条目数
+        """
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, Tuple[Dict[str, Any], float]]" = OrderedDict()
+
+    @property
+    def enabled(self) -> bool:
+        """缓存是否启用"""
+        return self.ttl > 0 and self.max_size > 0
+
+    @staticmethod
+    def make_key(prompt: str) -> str:
+        """计算 Prompt 的 SHA-256 摘要作为缓存键"""
+        return hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """读取缓存的分析结果
+
+        返回深拷贝，调用方修改结果（如附加 processing_time_ms）不会污染缓存。
+
+        Args:
+            key: make_key() 生成的缓存键
+
+        Returns:
+            dict: 命中且未过期时返回分析结果副本，否则返回 None
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at <= time.time():
+            # 已过期：直接丢弃，等待下一次 LLM 调用重新写入
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return copy.deepcopy(value)
+
+    def set(self, key: str, value: Dict[str, Any]):
+        """写入分析结果（保存深拷贝）
+
+        Args:
+            key: make_key() 生成的缓存键
+            value: 解析后的 LLM 分析结果
+        """
+        if not self.enabled:
+            return
+        self._entries[key] = (copy.deepcopy(value), time.time() + self.ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        """清空缓存"""
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+# ==================== 全局实例工厂函数 ====================
+# 三个专家智能体共享同一个缓存实例
+_llm_cache_instance: Optional[LLMResponseCache] = None
+
+
+def get_llm_cache() -> LLMResponseCache:
+    """获取全局 LLM 响应缓存实例（工厂函数 + 单例模式）
+
+    Returns:
+        LLMResponseCache: 全局唯一的缓存实例
+    """
+    global _llm_cache_instance
+    if _llm_cache_instance is None:
+        _llm_cache_instance = LLMResponseCache(
+            ttl=float(os.getenv("LLM_CACHE_TTL", "600")),
+            max_size=int(os.getenv("LLM_CACHE_SIZE", "1024")),
+        )
+    return _llm_cache_instance
@@ -15,13 +15,130 @@
 - 提示词工程：每种攻击类型有精心设计的 Prompt 模板，引导 LLM 输出结构化 JSON
 - 优雅降级：LLM 不可用时自动切换到规则引擎，保证分析服务不中断
 - 性能监控：记录 LLM 调用耗时、输入/输出 token 数量等性能指标
+- 响应缓存：相同 Prompt 的 LLM 分析结果在全局缓存中复用，重复告警不再请求 LLM
+- 批量并发：analyze_batch() 在信号量限流下并发分析多条告警，总耗时接近单次最慢请求
 """
+import asyncio
+import os
+import random
+import re
+import string
 import time
 import json
-from typing import Dict, Any
+import math
+from typing import Dict, Any, List
+import httpx
+import orjson
+from src.agents._llm_cache import LLMResponseCache, get_llm_cache
 from src.models.llm_inference import get_llm_inference
 from src.utils.structured_logger import get_logger
 
+
+# ==================== 规则分析关键词表 ====================
+# 按优先级排列的 (关键词正则, 风险评分, 攻击技术, 防御建议)，模块加载时编译一次。
+# 每类攻击的关键词合并成一条 "a|b|c" 形式的正则，_rule_based_analysis() 只需对每类扫描一遍载荷。
+def _keyword_pattern(keywords):
+    """将关键词列表编译为单条交替正则（关键词按字面匹配，忽略大小写）
+
+    使用 IGNORECASE 在匹配时忽略大小写，不必先对整段载荷调用 lower() 复制一份；
+    关键词都是 ASCII，配合 re.ASCII 只做 ASCII 大小写折叠，与原先 lower() 后匹配的结果一致。
+    """
+    return re.compile("|".join(re.escape(kw) for kw in keywords), re.IGNORECASE | re.ASCII)
+
+
+_RULE_TABLE = (
+    # SQL注入特征：UNION、SELECT、DROP、INSERT、单引号注入（' or）、SQL注释（--）
+    (_keyword_pattern(['union', 'select', 'drop', 'insert', "' or", '-- ']),
+     8.5, 'SQL注入', ('使用参数化查询', '部署WAF', '输入验证')),
+    # XSS（跨站脚本）特征：<script>标签、javascript:协议、onerror事件、alert()函数
+    (_keyword_pattern(['<script', 'javascript:', 'onerror=', 'alert(']),
+     7.5, 'XSS跨站脚本', ('输出编码', 'CSP策略', '输入过滤')),
+    # 命令注入特征：wget/curl下载、bash执行、管道符(|)、分号(;)、逻辑与(&&)
+    (_keyword_pattern(['wget', 'curl', 'bash', '| ', '; ', '&& ']),
+     9.0, '命令注入', ('禁用危险函数', '白名单验证', '权限最小化')),
+    # C2通信特征：HTTP URL、PowerShell、cmd.exe
+    (_keyword_pattern(['http://', 'https://', 'powershell', 'cmd.exe']),
+     8.0, 'C2通信', ('阻断可疑IP', '流量监控', '终端检测')),
+)
+
+# 慢速路径使用的标准库解码器（orjson 不支持 raw_decode 式的前缀解析）
+_JSON_DECODER = json.JSONDecoder()
+
+
+def _threat_level(risk_score: float) -> str:
+    """根据风险评分映射威胁等级：≥7 为高危，≥4 为中危，其他为低危"""
+    return '高危' if risk_score >= 7 else '中危' if risk_score >= 4 else '低危'
+
+
+def _normalize_result(result: Dict[str, Any]) -> Dict[str, Any]:
+    """规范化 LLM 返回的分析结果字段类型（原地修改并返回）
+
+    分析结果以原始字典的形式直接返回给 API 并写入内存存储，不再经过 Pydantic 模型校验，
+    因此在这里保证 ExpertAnalysis 约定的字段类型：
+    - risk_score: 转换为 float 并限制在 0~10（如 "8" → 8.0），无法转换时取默认值 5.0
+    - threat_level: 始终由 risk_score 推导（与规则分析一致），不采用 LLM 给出的任意取值
+    - recommendations: 字符串列表（单个字符串包装为列表，其他类型丢弃）
+    - attack_technique / analysis: 字符串
+    """
+    try:
+        risk_score = float(result.get('risk_score', 5.0))
+    except (TypeError, ValueError):
+        risk_score = 5.0
+    if not math.isfinite(risk_score):
+        risk_score = 5.0
+    risk_score = min(max(risk_score, 0.0), 10.0)
+    result['risk_score'] = risk_score
+    result['threat_level'] = _threat_level(risk_score)
+
+    recommendations = result.get('recommendations')
+    if isinstance(recommendations, str):
+        recommendations = [recommendations]
+    elif isinstance(recommendations, (list, tuple)):
+        recommendations = [str(item) for item in recommendations if item is not None]
+    else:
+        recommendations = []
+    result['recommendations'] = recommendations
+
+    for key, default in (('attack_technique', 'unknown'), ('analysis', '')):
+        value = result.get(key)
+        result[key] = default if value is None else str(value)
+    return result
+
+
+def _is_retryable_llm_error(error: Exception) -> bool:
+    """判断 LLM 调用异常是否值得重试
+
+    网络层错误（超时、连接失败）以及 429 限流、5xx 服务端错误通常是暂时性的；
+    4xx 客户端错误（如 API Key 无效）和响应格式错误重试也不会成功。
+    """
+    if isinstance(error, (httpx.TransportError, asyncio.TimeoutError)):
+        return True
+    if isinstance(error, httpx.HTTPStatusError):
+        status = error.response.status_code
+        return status == 429 or status >= 500
+    return False
+
+
+# 提示词模板中允许出现的字段，_generate_prompt() 按此顺序构建字段值元组
+_PROMPT_FIELDS = ('attack_type', 'payload', 'source_ip', 'target_ip')
+
+
+def _compile_template(template: str):
+    """预先解析 str.format 风格的模板
+
+    用 string.Formatter 把模板拆成 (字面量片段, 字段下标) 序列，{{ 和 }} 转义在此时一次性还原。
+    字段名在解析时换算为 _PROMPT_FIELDS 中的下标，渲染时按下标取值，无需构建字段字典。
+    模板中的字段不带格式说明符（如 {payload}），因此可以直接替换为字符串值。
+
+    Returns:
+        tuple: ((literal, field_index 或 None), ...)
+    """
+    return tuple(
+        (literal, None if field is None else _PROMPT_FIELDS.index(field))
+        for literal, field, _, _ in string.Formatter().parse(template)
+    )
+
+
 class OptimizedExpertAgent:
     """专家智能体 - 精简版
     
@@ -31,23 +148,26 @@ class OptimizedExpertAgent:
     - illegal_connection: 网络连接专家（C2通信、僵尸网络等）
     """
     
-    def __init__(self, expert_type: str):
-        """初始化专家智能体
-        
-        Args:
-            expert_type: 专家类型标识，决定使用哪套提示词模板进行分析。
-                         可选值：'web_attack', 'vulnerability_attack', 'illegal_connection'
-        """
-        self.expert_type = expert_type         # 记录该专家的领域类型
-        self.logger = get_logger()             # 获取全局结构化日志记录器
-        
-        # 专家提示词模板字典
-        # 每个模板都指示 LLM 扮演特定领域的安全专家角色，并要求以 JSON 格式返回分析结果
-        # 模板中使用 {attack_type}、{payload} 等占位符，在生成 Prompt 时被实际告警数据替换
-        # 注意：模板中的 {{ 和 }} 是 Python str.format() 中对花括号的转义写法，
-        #       渲染后会变成单个 { 和 }，作为 JSON 示例展示给 LLM
-        self.prompt_templates = {
-            'web_attack': """你是一名资深Web安全分析专家，擅长识别OWASP Top 10及各类Web攻击技术。
+    # 批量分析时同时在途的 LLM 请求上限（可通过环境变量 EXPERT_MAX_CONCURRENCY 调整）
+    MAX_CONCURRENCY = int(os.getenv("EXPERT_MAX_CONCURRENCY", "5"))
+    # 获取信号量前的随机抖动上限（秒），错开同一批请求的发起时刻，避免触发 API 限流（429）
+    BATCH_JITTER_S = 0.05
+    
+    # LLM 调用重试参数：最多尝试 3 次，退避时间为 [0, min(4, 0.3 × 2^n)] 秒内的随机值
+    LLM_MAX_ATTEMPTS = 3
+    LLM_RETRY_BASE_S = 0.3
+    LLM_RETRY_MAX_S = 4.0
+    
+    # 所有专家共享的 LLM 推理实例（首次调用 LLM 时获取；获取失败时保持 None，下次重试）
+    _shared_llm = None
+    
+    # 专家提示词模板字典（类属性：所有专家实例共享同一份，不随实例重复创建）
+    # 每个模板都指示 LLM 扮演特定领域的安全专家角色，并要求以 JSON 格式返回分析结果
+    # 模板中使用 {attack_type}、{payload} 等占位符，在生成 Prompt 时被实际告警数据替换
+    # 注意：模板中的 {{ 和 }} 是 Python str.format() 中对花括号的转义写法，
+    #       渲染后会变成单个 { 和 }，作为 JSON 示例展示给 LLM
+    prompt_templates = {
+        'web_attack': """你是一名资深Web安全分析专家，擅长识别OWASP Top 10及各类Web攻击技术。
 
 ## 告警信息
 - 攻击类型: {attack_type}
@@ -72,8 +192,8 @@ class OptimizedExpertAgent:
     "recommendations": ["最高优先级建议", "次优先级建议", "补充建议"],
     "analysis": "详细分析：包括攻击原理、潜在影响范围、攻击者意图判断"
 }}""",
-            
-            'vulnerability_attack': """你是一名资深漏洞利用分析专家，熟悉CVE漏洞库和常见漏洞利用框架（Metasploit、Cobalt Strike等）。
+        
+        'vulnerability_attack': """你是一名资深漏洞利用分析专家，熟悉CVE漏洞库和常见漏洞利用框架（Metasploit、Cobalt Strike等）。
 
 ## 告警信息
 - 攻击类型: {attack_type}
@@ -99,8 +219,8 @@ class OptimizedExpertAgent:
     "recommendations": ["紧急修复建议", "加固建议", "检测建议"],
     "analysis": "详细分析：包括漏洞原理、利用条件、影响范围、攻击阶段判断"
 }}""",
-            
-            'illegal_connection': """你是一名资深网络威胁情报分析专家，擅长识别C2通信、数据外泄、横向移动等异常网络行为。
+        
+        'illegal_connection': """你是一名资深网络威胁情报分析专家，擅长识别C2通信、数据外泄、横向移动等异常网络行为。
 
 ## 告警信息
 - 攻击类型: {attack_type}
@@ -126,17 +246,39 @@ class OptimizedExpertAgent:
     "recommendations": ["紧急响应措施", "取证分析建议", "长期防御建议"],
     "analysis": "详细分析：包括通信模式特征、威胁归因、潜在攻击阶段（初始访问/持久化/数据外泄）"
 }}"""
-        }
+    }
+    
+    # 各专家模板的预解析片段，类定义时构建一次，供 _generate_prompt() 直接拼接
+    _PROMPT_SEGMENTS = {
+        expert_type: _compile_template(template)
+        for expert_type, template in prompt_templates.items()
+    }
+    
+    def __init__(self, expert_type: str):
+        """初始化专家智能体
+        
+        Args:
+            expert_type: 专家类型标识，决定使用哪套提示词模板进行分析。
+                         可选值：'web_attack', 'vulnerability_attack', 'illegal_connection'
+        """
+        self.expert_type = expert_type         # 记录该专家的领域类型
+        self.logger = get_logger()             # 获取全局结构化日志记录器
+        
+        # 选定当前专家使用的预解析模板，如果类型不存在则回退到 web_attack 模板
+        self._prompt_segments = self._PROMPT_SEGMENTS.get(
+            self.expert_type, self._PROMPT_SEGMENTS['web_attack']
+        )
     
     async def analyze(self, alert_data: Dict[str, Any]) -> Dict[str, Any]:
         """执行专家级威胁分析（异步方法）
         
         这是专家智能体的核心入口方法，完整的分析流程：
         1. 根据 expert_type 生成对应的 Prompt
-        2. 调用远程 LLM API 获取分析结果
-        3. 解析 LLM 的 JSON 响应
-        4. 若 LLM 调用失败，降级到基于规则的本地分析
-        5. 记录分析日志（包括性能指标）
+        2. 以 Prompt 摘要查询 LLM 响应缓存，命中则直接使用缓存结果
+        3. 未命中时调用远程 LLM API 获取分析结果
+        4. 解析 LLM 的 JSON 响应并写入缓存
+        5. 若 LLM 调用失败，降级到基于规则的本地分析（降级结果不缓存）
+        6. 记录分析日志（包括性能指标）
         
         降级机制说明：
         - 当 LLM API 不可用（网络超时、API Key 无效等）时，
@@ -150,33 +292,102 @@ class OptimizedExpertAgent:
             dict: 分析结果，包含 attack_technique, risk_score, threat_level, 
                   recommendations, analysis, processing_time_ms, expert_type 等
         """
-        start_time = time.time()
+        start_time_ns = time.perf_counter_ns()
         
         # 步骤1: 根据专家类型和告警数据生成 LLM 提示词
         prompt = self._generate_prompt(alert_data)
         
-        # 步骤2: 调用 LLM 进行智能分析
+        # 步骤2: 查询 LLM 响应缓存，相同 Prompt 在有效期内直接复用解析结果
+        cache = get_llm_cache()
+        cache_key = cache.make_key(prompt)
+        result = cache.get(cache_key) if cache.enabled else None
+        if result is not None:
+            self.logger.log("llm_cache_hit", {
+                "expert_type": self.expert_type,
+                "cache_size": len(cache)
+            })
+        else:
+            result = await self._analyze_with_llm(prompt, alert_data, cache, cache_key)
+        
+        # 计算整体分析耗时（包括 Prompt 生成 + LLM 调用 + 结果解析）
+        processing_time_ms = (time.perf_counter_ns() - start_time_ns) // 1_000_000
+        
+        # 记录专家分析完成的日志
+        self.logger.log("expert_analysis", {
+            "expert_type": self.expert_type,
+            "attack_type": result.get('attack_technique', 'unknown'),
+            "risk_score": result.get('risk_score', 5.0),
+            "processing_time_ms": processing_time_ms
+        })
+        
+        # 在分析结果中附加性能信息和专家类型标识
+        result['processing_time_ms'] = processing_time_ms
+        result['expert_type'] = self.expert_type
+        
+        return result
+    
+    async def analyze_batch(self, alerts: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """并发分析多条告警（异步方法）
+        
+        各条告警的 LLM 调用互相独立，串行 await 时总耗时是各次网络延迟之和；
+        这里用 asyncio.gather 同时发起，并用信号量限制同时在途的请求数，
+        总耗时接近 (告警数 / MAX_CONCURRENCY) × 单次延迟。
+        每个任务在获取信号量前随机等待 0~BATCH_JITTER_S 秒，避免请求在同一时刻涌向 API。
+        
+        Args:
+            alerts: 告警数据字典列表
+            
+        Returns:
+            List[dict]: 分析结果列表，顺序与输入 alerts 一一对应
+        """
+        semaphore = asyncio.Semaphore(self.MAX_CONCURRENCY)
+        
+        async def analyze_one(alert_data: Dict[str, Any]) -> Dict[str, Any]:
+            await asyncio.sleep(random.uniform(0, self.BATCH_JITTER_S))
+            async with semaphore:
+                return await self.analyze(alert_data)
+        
+        # gather 按传入顺序返回结果，无需额外记录下标
+        return await asyncio.gather(*(analyze_one(alert) for alert in alerts))
+    
+    async def _analyze_with_llm(self, prompt: str, alert_data: Dict[str, Any],
+                                cache: LLMResponseCache, cache_key: str) -> Dict[str, Any]:
+        """调用 LLM 分析告警（缓存未命中时执行）
+        
+        LLM 调用成功时解析响应并写入缓存；调用失败时降级到规则分析，
+        降级结果不写入缓存，下一次相同告警仍会重新尝试 LLM。
+        
+        Args:
+            prompt: 已生成的提示词
+            alert_data: 告警数据字典（降级分析时使用）
+            cache: 全局 LLM 响应缓存
+            cache_key: 当前 Prompt 对应的缓存键
+            
+        Returns:
+            dict: LLM 解析结果或规则分析结果
+        """
         try:
             # 获取全局 LLM 推理实例（单例模式，避免重复初始化）
-            llm = get_llm_inference()
+            # 首次成功获取后缓存在类属性上，三个专家共享，后续调用不再经过工厂函数
+            llm = OptimizedExpertAgent._shared_llm
+            if llm is None:
+                llm = OptimizedExpertAgent._shared_llm = get_llm_inference()
             
-            # 简化的 token 数量估算：以空格分词近似计算输入 token 数
-            # 注意：这不是精确的 tokenizer 计算，仅用于日志统计
-            input_tokens = len(prompt.split())
+            # 简化的 token 数量估算：按约 4 字符/token 的经验值由字符数折算
+            # 注意：这不是精确的 tokenizer 计算，仅用于日志统计；
+            #       直接取长度即可，无需像 split() 那样为整段 Prompt 构建分词列表
+            input_tokens = len(prompt) >> 2
             
             # 调用远程 LLM API 生成分析结果
             # max_new_tokens=300: 限制输出长度，防止响应过长
             # temperature=0.3: 较低的温度值使输出更确定、更聚焦，适合安全分析场景
-            llm_start = time.time()
-            response = await llm.generate_response(
-                prompt,
-                max_new_tokens=512,
-                temperature=0.3
-            )
-            llm_time_ms = int((time.time() - llm_start) * 1000)
+            # 暂时性错误（超时、429、5xx）会在 _call_llm 内退避重试，重试耗尽后才降级
+            llm_start_ns = time.perf_counter_ns()
+            response = await self._call_llm(llm, prompt)
+            llm_time_ms = (time.perf_counter_ns() - llm_start_ns) // 1_000_000
             
-            # 估算输出 token 数量
-            output_tokens = len(response.split())
+            # 估算输出 token 数量（同样按字符数折算）
+            output_tokens = len(response) >> 2
             
             # 记录 LLM 调用性能日志，便于后续分析 API 调用成本和延迟
             self.logger.log("llm_inference", {
@@ -187,8 +398,9 @@ class OptimizedExpertAgent:
                 "model": "Qwen (remote API)"
             })
             
-            # 步骤3: 解析 LLM 的 JSON 格式响应
+            # 步骤3: 解析 LLM 的 JSON 格式响应，并写入缓存供相同告警复用
             result = self._parse_response(response)
+            cache.set(cache_key, result)
             
         except Exception as e:
             # LLM 调用失败时的降级处理
@@ -201,32 +413,50 @@ class OptimizedExpertAgent:
             # 降级到基于规则的本地分析（不依赖 LLM，纯关键词匹配）
             result = self._rule_based_analysis(alert_data)
         
-        # 计算整体分析耗时（包括 Prompt 生成 + LLM 调用 + 结果解析）
-        processing_time_ms = int((time.time() - start_time) * 1000)
-        
-        # 记录专家分析完成的日志
-        self.logger.log("expert_analysis", {
-            "expert_type": self.expert_type,
-            "attack_type": result.get('attack_technique', 'unknown'),
-            "risk_score": result.get('risk_score', 5.0),
-            "processing_time_ms": processing_time_ms
-        })
-        
-        # 在分析结果中附加性能信息和专家类型标识
-        result['processing_time_ms'] = processing_time_ms
-        result['expert_type'] = self.expert_type
-        
         return result
     
+    async def _call_llm(self, llm, prompt: str) -> str:
+        """调用 LLM 生成分析结果，暂时性错误时按指数退避 + 随机抖动重试
+        
+        Args:
+            llm: 全局 LLM 推理实例
+            prompt: 已生成的提示词
+            
+        Returns:
+            str: LLM 响应文本
+            
+        Raises:
+            Exception: 不可重试的错误，或重试次数耗尽后的最后一次错误
+        """
+        for attempt in range(1, self.LLM_MAX_ATTEMPTS + 1):
+            try:
+                return await llm.generate_response(
+                    prompt,
+                    max_new_tokens=512,
+                    temperature=0.3
+                )
+            except Exception as e:
+                if attempt == self.LLM_MAX_ATTEMPTS or not _is_retryable_llm_error(e):
+                    raise
+                # Full Jitter：在 [0, 退避上限] 内随机等待，分散并发请求的重试时刻
+                delay = random.uniform(0, min(self.LLM_RETRY_MAX_S, self.LLM_RETRY_BASE_S * 2 ** attempt))
+                self.logger.log("llm_retry", {
+                    "expert_type": self.expert_type,
+                    "attempt": attempt,
+                    "delay_ms": int(delay * 1000),
+                    "error": str(e)
+                }, level="WARN")
+                await asyncio.sleep(delay)
+    
     def _generate_prompt(self, alert_data: Dict[str, Any]) -> str:
         """根据专家类型和告警数据生成 LLM 提示词
         
-        从 prompt_templates 中选取对应专家类型的模板，
-        使用 str.format() 将告警数据中的各字段填充到模板占位符中。
+        使用初始化时预解析的模板片段（_prompt_segments），
+        将告警数据中的各字段按顺序拼接到字面量片段之间。
         
         安全措施：
         - 使用 dict.get() 提供默认值，防止字段缺失导致 KeyError
-        - payload 字段截取前 500 字符，防止超长载荷导致 Prompt 过大
+        - payload 字段截取前 500 字符，防止超长载荷导致 Prompt 过大（为 None 时按空字符串处理）
         
         Args:
             alert_data: 告警数据字典
@@ -234,52 +464,69 @@ class OptimizedExpertAgent:
         Returns:
             str: 填充完成的完整提示词字符串
         """
-        # 获取对应专家类型的模板，如果类型不存在则回退到 web_attack 模板
-        template = self.prompt_templates.get(self.expert_type, self.prompt_templates['web_attack'])
-        
-        # 用告警数据填充模板中的占位符
-        return template.format(
-            attack_type=alert_data.get('attack_type', 'unknown'),
-            payload=alert_data.get('payload', '')[:500],  # 限制 payload 长度为500字符，避免 Prompt 过长
-            source_ip=alert_data.get('source_ip', 'unknown'),
-            target_ip=alert_data.get('target_ip', 'unknown')
+        get = alert_data.get
+        values = (
+            get('attack_type', 'unknown'),
+            (get('payload') or '')[:500],   # 限制 payload 长度为500字符，避免 Prompt 过长
+            get('source_ip', 'unknown'),
+            get('target_ip', 'unknown')
         )
+        
+        # 用告警数据填充模板中的占位符（按片段顺序拼接）
+        parts = []
+        for literal, index in self._prompt_segments:
+            parts.append(literal)
+            if index is not None:
+                parts.append(str(values[index]))
+        return "".join(parts)
     
     def _parse_response(self, response: str) -> Dict[str, Any]:
         """解析 LLM 返回的响应文本，尝试提取其中的 JSON 结构
         
         LLM 的输出通常是混合文本，其中嵌套了 JSON 格式的分析结果。
-        本方法通过定位第一个 '{' 和最后一个 '}' 来提取 JSON 子串。
+        本方法先定位第一个 '{' 和最后一个 '}' 提取 JSON 子串，失败时再逐个尝试 '{' 起点。
         
         解析策略：
-        1. 找到响应中 JSON 对象的起止位置（最外层的 { 和 }）
-        2. 提取 JSON 子串并使用 json.loads() 解析
-        3. 如果解析失败（格式错误、无 JSON 等），返回默认的基础分析结构
+        1. 快速路径：找到响应中最外层的 { 和 }，用 orjson 解析这段子串（LLM 通常只返回一个 JSON 对象）
+        2. 慢速路径：若 JSON 之后还跟有代码块、示例等包含花括号的内容，快速路径会截到错误的 '}'；
+           此时从每个 '{' 起用 JSONDecoder.raw_decode 尝试解析，返回第一个完整的 JSON 对象
+           （raw_decode 只消费一个合法 JSON 值，会正确跳过字符串中的花括号）
+        3. 如果都解析失败（格式错误、无 JSON 等），返回默认的基础分析结构
+        
+        解析出的结果经 _normalize_result() 规范化字段类型后返回（随后写入缓存）。
         
         Args:
             response: LLM 的原始响应文本
             
         Returns:
-            dict: 解析后的分析结果字典
+            dict: 解析并规范化后的分析结果字典
         """
-        try:
-            # 定位 JSON 对象的边界：第一个 '{' 到最后一个 '}'
-            start = response.find('{')
-            end = response.rfind('}') + 1
-            if start != -1 and end > start:
-                json_str = response[start:end]
-                result = json.loads(json_str)
-                return result
-        except:
-            pass  # JSON 解析失败，使用下方的默认返回值
+        start = response.find('{')
+        end = response.rfind('}') + 1
+        if start != -1 and end > start:
+            try:
+                result = orjson.loads(response[start:end])
+                if isinstance(result, dict):
+                    return _normalize_result(result)
+            except orjson.JSONDecodeError:
+                pass  # 快速路径失败，进入逐个起点尝试
+            
+            while start != -1:
+                try:
+                    result, _ = _JSON_DECODER.raw_decode(response, start)
+                    if isinstance(result, dict):
+                        return _normalize_result(result)
+                except ValueError:
+                    pass
+                start = response.find('{', start + 1)
         
         # 解析失败时返回默认结构，保证调用方始终能获得有效的分析结果
-        return {
+        return _normalize_result({
             'attack_technique': 'unknown',
             'risk_score': 5.0,                      # 默认中等风险评分
             'analysis': response[:200],              # 截取 LLM 原始响应的前200字符作为分析内容
             'recommendations': ['提高警惕', '进一步分析']  # 通用的默认建议
-        }
+        })
     
     def _rule_based_analysis(self, alert_data: Dict[str, Any]) -> Dict[str, Any]:
         """基于规则的分析（LLM 调用失败时的降级方案）
@@ -298,43 +545,26 @@ class OptimizedExpertAgent:
         Returns:
             dict: 基于规则的分析结果，格式与 LLM 分析结果保持一致
         """
-        payload = alert_data.get('payload', '').lower()    # 转小写以实现大小写无关匹配
-        attack_type = alert_data.get('attack_type', '').lower()
+        payload = alert_data.get('payload', '')    # 正则已设置 IGNORECASE，无需转小写
         
         risk_score = 5.0                # 默认风险评分
         technique = 'unknown'           # 默认攻击技术
         recommendations = []            # 默认防御建议列表
         
-        # 规则链：按优先级依次匹配各种攻击类型
-        # SQL注入特征：UNION、SELECT、DROP、INSERT、单引号注入（' or）、SQL注释（--）
-        if any(kw in payload for kw in ['union', 'select', 'drop', 'insert', "' or", '-- ']):
-            risk_score = 8.5
-            technique = 'SQL注入'
-            recommendations = ['使用参数化查询', '部署WAF', '输入验证']
-        
-        # XSS（跨站脚本）特征：<script>标签、javascript:协议、onerror事件、alert()函数
-        elif any(kw in payload for kw in ['<script', 'javascript:', 'onerror=', 'alert(']):
-            risk_score = 7.5
-            technique = 'XSS跨站脚本'
-            recommendations = ['输出编码', 'CSP策略', '输入过滤']
-        
-        # 命令注入特征：wget/curl下载、bash执行、管道符(|)、分号(;)、逻辑与(&&)
-        elif any(kw in payload for kw in ['wget', 'curl', 'bash', '| ', '; ', '&& ']):
-            risk_score = 9.0
-            technique = '命令注入'
-            recommendations = ['禁用危险函数', '白名单验证', '权限最小化']
-        
-        # C2通信特征：HTTP URL、PowerShell、cmd.exe
-        elif any(kw in payload for kw in ['http://', 'https://', 'powershell', 'cmd.exe']):
-            risk_score = 8.0
-            technique = 'C2通信'
-            recommendations = ['阻断可疑IP', '流量监控', '终端检测']
+        # 规则链：按优先级依次用预编译的关键词正则匹配各种攻击类型
+        # 每条正则在 C 层一次扫描完载荷，无需逐个关键词做子串查找
+        for pattern, rule_score, rule_technique, rule_recommendations in _RULE_TABLE:
+            if pattern.search(payload):
+                risk_score = rule_score
+                technique = rule_technique
+                recommendations = list(rule_recommendations)
+                break
         
         return {
             'attack_technique': technique,
             'risk_score': risk_score,
             # 根据风险评分自动映射威胁等级：≥7 为高危，≥4 为中危，其他为低危
-            'threat_level': '高危' if risk_score >= 7 else '中危' if risk_score >= 4 else '低危',
+            'threat_level': _threat_level(risk_score),
             'recommendations': recommendations,
             'analysis': f'基于规则分析识别为{technique}，风险评分{risk_score}'
         }
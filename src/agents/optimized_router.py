@@ -12,12 +12,24 @@
 - 关键词匹配侧重快速筛选，权重为 0.6；正则匹配侧重精准识别，权重为 0.4
 - 当所有类别得分都很低时（< 0.5），自动降低置信度，表示路由结果不确定
 - 支持三大攻击类别：web_attack、vulnerability_attack、illegal_connection
+- 若安装了 hyperscan，所有类别的正则会编译进同一个 Hyperscan 数据库，一次扫描完成全部模式匹配；
+  未安装时使用标准库 re
 """
+import hashlib
+import os
 import re
 import time
+from collections import OrderedDict
+from operator import itemgetter
 from typing import Dict, Any, Tuple
 from src.utils.structured_logger import get_logger
 
+try:
+    # 可选依赖：Hyperscan 多模式正则引擎（SIMD 实现，一次扫描同时匹配全部模式）
+    import hyperscan
+except ImportError:
+    hyperscan = None
+
 class OptimizedRouterAgent:
     """路由智能体 - 精简版
     
@@ -27,6 +39,9 @@ class OptimizedRouterAgent:
     - 返回路由结果（目标专家类型 + 置信度 + 耗时）
     """
     
+    # 路由决策缓存的最大条目数（环境变量 ROUTE_CACHE_SIZE），设为 0 时关闭缓存
+    ROUTE_CACHE_SIZE = int(os.getenv("ROUTE_CACHE_SIZE", "4096"))
+    
     def __init__(self):
         """初始化路由智能体
         
@@ -35,10 +50,11 @@ class OptimizedRouterAgent:
         - vulnerability_attack: 漏洞利用攻击（CVE、Exploit、Shellcode等）
         - illegal_connection: 非法连接/网络攻击（C2通信、僵尸网络、DDoS等）
         
-        初始化完成后，所有正则表达式会被预编译（compiled_patterns），
-        避免每次路由时重复编译，提升匹配效率。
+        初始化完成后，每个类别的正则表达式会被预编译（compiled_patterns），
+        避免每次路由时重复编译。
         """
-        # 路由规则字典：每个攻击类别包含 keywords（关键词列表）和 patterns（正则模式列表）
+        # 路由规则字典：每个攻击类别包含 keywords（关键词列表）、patterns（正则模式列表）
+        # 和 anchors（正则预筛选用的字面片段，须为小写，修改 patterns 时需同步维护）
         self.routing_rules = {
             'web_attack': {
                 # Web攻击相关关键词，用于快速文本匹配
@@ -49,7 +65,10 @@ class OptimizedRouterAgent:
                     r'(?i)(union\s+select|select\s+.*\s+from)',   # SQL注入典型模式：UNION SELECT 或 SELECT ... FROM
                     r'(?i)(<script|javascript:|on\w+=)',           # XSS攻击模式：<script>标签、javascript:协议、事件处理器
                     r'(?i)(\.\.\/|\.\.\\|%2e%2e)',                 # 目录遍历模式：../、..\、URL编码的 %2e%2e
-                ]
+                ],
+                # 正则预筛选锚点：上述任一正则命中时，文本中必然包含其中至少一个字面片段
+                # （on\w+= 事件处理器模式以 '=' 作为锚点）
+                'anchors': ('select', '<script', 'javascript:', '=', '..', '%2e'),
             },
             'vulnerability_attack': {
                 # 漏洞利用相关关键词
@@ -60,7 +79,8 @@ class OptimizedRouterAgent:
                     r'(?i)(cve-\d{4}-\d+)',           # CVE漏洞编号模式：CVE-年份-编号
                     r'(?i)(exploit|vulnerability)',    # 漏洞利用关键词匹配
                     r'(?i)(shellcode|payload)',        # Shellcode/载荷关键词匹配
-                ]
+                ],
+                'anchors': ('cve-', 'exploit', 'vulnerability', 'shellcode', 'payload'),
             },
             'illegal_connection': {
                 # 非法连接/网络攻击相关关键词
@@ -71,18 +91,61 @@ class OptimizedRouterAgent:
                     r'(?i)(c2\s+communication)',    # C2（Command & Control）通信模式
                     r'(?i)(botnet|zombie)',          # 僵尸网络关键词
                     r'(?i)(ddos|dos\s+attack)',      # DDoS/DoS攻击模式
-                ]
+                ],
+                'anchors': ('c2', 'botnet', 'zombie', 'dos'),
             }
         }
         
         # 预编译所有正则表达式模式
-        # 将字符串形式的正则预编译为 re.Pattern 对象，后续匹配时直接使用 pattern.search()
-        # 好处：避免每次路由决策时都重新编译正则，显著提升性能
+        # 每条模式单独编译，_calculate_scores() 中逐条 search()，命中即返回、计数加一。
+        # 实测在 CPython re 中，把多条正则合并为一条零宽先行断言交替正则 (?=(?P<g0>...))|... 
+        # 再用 finditer 逐位置扫描，反而比逐条 search() 慢 2~3 倍：search() 找到第一个命中就停止，
+        # 还能利用每条模式自身的字面前缀快速跳过不可能匹配的位置。
+        # 真正的"一次扫描匹配全部模式"由下面可选的 Hyperscan 数据库提供。
         for category in self.routing_rules:
-            patterns = self.routing_rules[category]['patterns']
-            self.routing_rules[category]['compiled_patterns'] = [
-                re.compile(pattern) for pattern in patterns
-            ]
+            self.routing_rules[category]['compiled_patterns'] = tuple(
+                re.compile(pattern) for pattern in self.routing_rules[category]['patterns']
+            )
+        
+        # 路由热路径上按顺序使用的 (类别, 锚点元组, 各正则的 search 方法) 三元组
+        # 预先取出绑定方法，_calculate_scores() 中不再逐次查 routing_rules 字典和方法属性
+        self._category_matchers = tuple(
+            (category, rules['anchors'], tuple(pattern.search for pattern in rules['compiled_patterns']))
+            for category, rules in self.routing_rules.items()
+        )
+        
+        # 可选：把全部类别的原始正则编译进同一个 Hyperscan 块模式数据库
+        # 模式 id 按顺序编号，通过 _hs_id_to_category 映射回所属类别；未安装或编译失败时为 None
+        self._hs_db, self._hs_id_to_category = self._build_hyperscan_db()
+        
+        # 关键词匹配：在一份小写文本上逐个做子串查找（str.__contains__）
+        # CPython 的子串查找在 C 层完成（fastsearch），对路由这种十几个关键词、几百字节文本的规模，
+        # 远快于把关键词合并成一条大小写无关的交替正则、由正则引擎逐位置尝试的做法。
+        # 过短的关键词作为子串极易误报（如 "tor" 命中 "vector"/"history"，"c2" 命中十六进制哈希），
+        # 这类关键词用 \b 限定为整词匹配：先做子串查找，命中后再用正则确认单词边界；
+        # 其余关键词仍按子串匹配，以保留 "mysql"、"fileupload" 等组合词的命中。
+        self._whole_word_keywords = {'tor', 'c2'}
+        self._substring_keywords = tuple(
+            (kw, category)
+            for category, rules in self.routing_rules.items()
+            for kw in rules['keywords']
+            if kw not in self._whole_word_keywords
+        )
+        self._whole_word_matchers = tuple(
+            (kw, category, re.compile(rf"\b{re.escape(kw)}\b").search)
+            for category, rules in self.routing_rules.items()
+            for kw in rules['keywords']
+            if kw in self._whole_word_keywords
+        )
+        
+        # 路由决策缓存（LRU）：字段摘要 -> (selected_route, confidence, logged_scores)
+        # logged_scores 是写入 router_decision 日志用的各类别得分（保留 2 位小数），随决策一起缓存
+        # 扫描器批量扫描、PoC 重放等场景下相同告警会反复出现，命中时直接复用上次的决策，
+        # 跳过 _calculate_scores() 和 _select_route()。
+        # 载荷由攻击者控制且长度不受限，因此不以文本本身作键，而是用 _cache_key() 计算的
+        # 16 字节 BLAKE2b 摘要作键：缓存占用只与条目数有关，不会被超长载荷撑大。
+        # route() 中读写缓存之间没有 await，在事件循环中无需加锁。
+        self._route_cache: "OrderedDict[bytes, Tuple[str, float, Dict[str, float]]]" = OrderedDict()
         
         # 获取全局结构化日志记录器，用于记录路由决策过程
         self.logger = get_logger()
@@ -91,7 +154,7 @@ class OptimizedRouterAgent:
         """路由决策（异步方法）
         
         这是路由智能体的核心入口方法，执行完整的路由决策流程：
-        1. 从告警数据中提取并合并文本特征（attack_type + payload + raw_log）
+        1. 从告警数据中提取文本特征（attack_type、payload、raw_log 三个字段）
         2. 调用 _calculate_scores() 计算各攻击类别的匹配分数
         3. 调用 _select_route() 选择得分最高的类别作为路由目标
         4. 记录决策日志并返回路由结果
@@ -108,23 +171,40 @@ class OptimizedRouterAgent:
                 - confidence (float): 路由置信度（0~1）
                 - processing_time_ms (int): 路由决策耗时（毫秒）
         """
-        start_time = time.time()
+        start_time_ns = time.perf_counter_ns()
         
         # 提取告警数据中的关键文本字段
-        # 将 attack_type、payload、raw_log 三个字段拼接为一个文本，统一转小写以实现大小写无关匹配
+        # attack_type、payload、raw_log 三个字段以元组形式交给 _calculate_scores()（其摘要作为路由缓存的键），
+        # 正则逐字段扫描，不会产生跨字段的命中；空字段直接跳过
         attack_type = alert_data.get('attack_type', '')
         payload = alert_data.get('payload', '')
         raw_log = alert_data.get('raw_log', '')
-        combined_text = f"{attack_type} {payload} {raw_log}".lower()
-        
-        # 计算当前告警文本与各攻击类别的匹配分数
-        route_scores = self._calculate_scores(combined_text)
+        fields = tuple(field for field in (attack_type, payload, raw_log) if field)
+        cache_key = self._cache_key(fields) if self.ROUTE_CACHE_SIZE > 0 else None
         
-        # 根据匹配分数选择最佳路由和对应的置信度
-        selected_route, confidence = self._select_route(route_scores)
+        cached = self._route_cache.get(cache_key) if cache_key is not None else None
+        if cached is not None:
+            # 缓存命中：标记为最近使用，直接复用路由决策
+            self._route_cache.move_to_end(cache_key)
+            selected_route, confidence, logged_scores = cached
+        else:
+            # 计算当前告警文本与各攻击类别的匹配分数
+            route_scores = self._calculate_scores(fields)
+            
+            # 根据匹配分数选择最佳路由和对应的置信度
+            selected_route, confidence = self._select_route(route_scores)
+            
+            # 日志中的各类别得分只在计算新决策时构建一次（route_scores 的键恰好是三个主要类别）
+            logged_scores = {k: round(v, 2) for k, v in route_scores.items()}
+            
+            if cache_key is not None:
+                self._route_cache[cache_key] = (selected_route, confidence, logged_scores)
+                if len(self._route_cache) > self.ROUTE_CACHE_SIZE:
+                    # 超出容量时淘汰最久未使用的条目
+                    self._route_cache.popitem(last=False)
         
         # 计算路由决策耗时（毫秒）
-        processing_time_ms = int((time.time() - start_time) * 1000)
+        processing_time_ms = (time.perf_counter_ns() - start_time_ns) // 1_000_000
         
         # 记录路由决策日志，包含用户查询、路由结果、置信度、耗时和各类别得分
         self.logger.log("router_decision", {
@@ -132,7 +212,7 @@ class OptimizedRouterAgent:
             "selected_route": selected_route,                                   # 最终选择的路由目标
             "confidence": round(confidence, 3),                                 # 置信度保留3位小数
             "processing_time_ms": processing_time_ms,                           # 决策耗时
-            "route_scores": {k: round(v, 2) for k, v in route_scores.items() if k in ['web_attack', 'vulnerability_attack', 'illegal_connection']}  # 各类别得分
+            "route_scores": logged_scores                                       # 各类别得分
         })
         
         return {
@@ -141,41 +221,141 @@ class OptimizedRouterAgent:
             'processing_time_ms': processing_time_ms
         }
     
-    def _calculate_scores(self, text: str) -> Dict[str, float]:
+    @staticmethod
+    def _cache_key(fields: Tuple[str, ...]) -> bytes:
+        """计算告警文本字段的路由缓存键（16 字节 BLAKE2b 摘要）
+        
+        每个字段先写入 8 字节长度前缀，字段内容中含有任何字符都不会与字段边界混淆。
+        
+        Args:
+            fields: route() 中提取的非空文本字段元组
+        
+        Returns:
+            bytes: 固定 16 字节的摘要
+        """
+        digest = hashlib.blake2b(digest_size=16)
+        for field in fields:
+            data = field.encode("utf-8", "surrogatepass")
+            digest.update(len(data).to_bytes(8, "little"))
+            digest.update(data)
+        return digest.digest()
+    
+    def _calculate_scores(self, texts: Tuple[str, ...]) -> Dict[str, float]:
         """计算各攻击类别的匹配分数
         
         对每个攻击类别，分别进行关键词匹配和正则匹配，加权求和得到综合得分。
+        各字段分别扫描，命中结果按类别合并（同一关键词/模式在多个字段中出现只计一次）。
         
         评分规则：
         - 关键词匹配：统计该类别下关键词在文本中出现的个数，每命中一个关键词加 0.6 分
+          （'tor'、'c2' 等短关键词须整词出现）
         - 正则匹配：统计该类别下编译后的正则表达式在文本中匹配成功的个数，每命中一个模式加 0.4 分
         - 总分 = 关键词命中数 × 0.6 + 正则命中数 × 0.4
         
         Args:
-            text: 预处理后的小写文本（由 attack_type + payload + raw_log 拼接而成）
+            texts: 文本字段元组（attack_type、payload、raw_log 中的非空字段）
             
         Returns:
             dict: 类别名 -> 匹配分数 的映射，如 {'web_attack': 1.8, 'vulnerability_attack': 0.0, ...}
         """
+        # 关键词和锚点在同一份小写文本上做子串查找：各字段以 \0 连接后统一转小写
+        # （\0 不出现在任何关键词/锚点中，且属于 \b 单词边界，不会产生跨字段的命中）
+        haystack = "\0".join(texts).lower()
+        
+        # 关键词匹配：每个关键词无论出现多少次只计一次，按所属类别计数
+        keyword_counts = dict.fromkeys(self.routing_rules, 0)
+        for kw, category in self._substring_keywords:
+            if kw in haystack:
+                keyword_counts[category] += 1
+        for kw, category, whole_word_search in self._whole_word_matchers:
+            if kw in haystack and whole_word_search(haystack):
+                keyword_counts[category] += 1
+        
         scores = {}
+        hs_counts = None  # Hyperscan 一次扫描得到的各类别命中模式数，首次需要时才扫描
         
-        for category, rules in self.routing_rules.items():
-            score = 0.0
-            
-            # 关键词匹配：遍历该类别的所有关键词，统计在文本中出现的数量
-            # 使用简单的 `in` 操作符判断子串存在性，速度快
-            keyword_matches = sum(1 for kw in rules['keywords'] if kw in text)
-            score += keyword_matches * 0.6  # 关键词匹配权重为 0.6
+        for category, anchors, pattern_searches in self._category_matchers:
+            keyword_matches = keyword_counts[category]
             
-            # 正则匹配：使用预编译的正则表达式进行模式搜索
+            # 正则匹配：统计该类别下在任一字段中命中的模式个数（Hyperscan 可用时一次扫描得到全部类别的结果）
             # 相比关键词匹配，正则可以识别更复杂的攻击模式（如 UNION SELECT 中间有空格等）
-            pattern_matches = sum(1 for pattern in rules['compiled_patterns'] if pattern.search(text))
-            score += pattern_matches * 0.4  # 正则匹配权重为 0.4
+            # 预筛选：该类别没有关键词命中且文本不含任何锚点片段时，正则不可能命中，直接跳过正则引擎
+            # （与攻击无关的普通流量走的就是这条路径）
+            if keyword_matches == 0 and not any(a in haystack for a in anchors):
+                pattern_matches = 0
+            elif self._hs_db is not None:
+                if hs_counts is None:
+                    hs_counts = self._hyperscan_pattern_counts(texts)
+                pattern_matches = hs_counts[category]
+            else:
+                pattern_matches = sum(
+                    1 for search in pattern_searches if any(search(text) for text in texts)
+                )
             
-            scores[category] = score
+            # 扫描过程只累加整数命中数，每个类别最后做一次加权求和：
+            # 关键词匹配权重为 0.6，正则匹配权重为 0.4
+            scores[category] = keyword_matches * 0.6 + pattern_matches * 0.4
         
         return scores
     
+    def _build_hyperscan_db(self):
+        """把所有类别的正则编译为一个 Hyperscan 块模式数据库
+        
+        编译标志：
+        - HS_FLAG_CASELESS: 大小写无关，替代各模式的 (?i) 内联标志
+        - HS_FLAG_SINGLEMATCH: 每个模式最多上报一次命中，正好对应"命中的模式个数"
+        - HS_FLAG_UTF8 | HS_FLAG_UCP: 按 UTF-8 解析文本，\w、\s 采用 Unicode 语义，与标准库 re 一致
+        
+        Returns:
+            tuple: (Hyperscan 数据库, 模式 id -> 类别名 列表)；未安装 hyperscan 或编译失败时为 (None, [])
+        """
+        if hyperscan is None:
+            return None, []
+        
+        expressions, id_to_category = [], []
+        for category, rules in self.routing_rules.items():
+            for pattern in rules['patterns']:
+                expressions.append(pattern.removeprefix('(?i)').encode('utf-8'))
+                id_to_category.append(category)
+        flags = (hyperscan.HS_FLAG_CASELESS | hyperscan.HS_FLAG_SINGLEMATCH
+                 | hyperscan.HS_FLAG_UTF8 | hyperscan.HS_FLAG_UCP)
+        
+        db = hyperscan.Database(mode=hyperscan.HS_MODE_BLOCK)
+        try:
+            db.compile(
+                expressions=expressions,
+                ids=list(range(len(expressions))),
+                elements=len(expressions),
+                flags=[flags] * len(expressions),
+            )
+        except hyperscan.error:
+            # 存在 Hyperscan 不支持的语法时回退到标准库 re
+            return None, []
+        return db, id_to_category
+    
+    def _hyperscan_pattern_counts(self, texts: Tuple[str, ...]) -> Dict[str, int]:
+        """使用 Hyperscan 逐个扫描文本字段，统计各类别命中的不同模式个数
+        
+        Args:
+            texts: 文本字段元组
+            
+        Returns:
+            dict: 类别名 -> 命中的模式个数
+        """
+        matched_ids = set()
+        
+        def on_match(pattern_id, start, end, flags, context):
+            matched_ids.add(pattern_id)
+        
+        # 文本中不合法的代理字符替换为 '?'，保证传给 Hyperscan 的是合法 UTF-8
+        for text in texts:
+            self._hs_db.scan(text.encode('utf-8', 'replace'), match_event_handler=on_match)
+        
+        counts = dict.fromkeys(self.routing_rules, 0)
+        for pattern_id in matched_ids:
+            counts[self._hs_id_to_category[pattern_id]] += 1
+        return counts
+    
     def _select_route(self, scores: Dict[str, float]) -> Tuple[str, float]:
         """根据匹配分数选择最佳路由
         
@@ -192,18 +372,14 @@ class OptimizedRouterAgent:
         Returns:
             tuple: (最佳路由类别名, 置信度)
         """
-        # 仅在三个主要攻击类别中选择路由目标
-        main_categories = ['web_attack', 'vulnerability_attack', 'illegal_connection']
-        
-        best_route = 'web_attack'  # 默认路由目标：当所有得分都为0时，回退到 web_attack
-        best_score = 0.0
-        
-        # 遍历各类别，找出得分最高的类别
-        for category in main_categories:
-            score = scores.get(category, 0.0)
-            if score > best_score:
-                best_score = score
-                best_route = category
+        # 仅在三个主要攻击类别中选择路由目标：类别固定为三个，直接取出三个分数，由 max() 选出最高者
+        # 分数相同时 max() 返回最先出现的类别，所有得分都为 0 时即回退到默认路由目标 web_attack
+        best_route, best_score = max(
+            (('web_attack', scores['web_attack']),
+             ('vulnerability_attack', scores['vulnerability_attack']),
+             ('illegal_connection', scores['illegal_connection'])),
+            key=itemgetter(1)
+        )
         
         # 根据最高得分计算置信度
         # 如果最高分过低（< 0.5），说明告警文本不明确，设置低置信度 0.3
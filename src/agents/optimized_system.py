@@ -14,7 +14,9 @@
 - MultiAgentSystem 是系统的唯一入口点，外部调用方（如 AgentService）只需与它交互
 - 内部维护 1 个路由智能体 + 3 个专家智能体的实例池
 - 使用 async/await 异步模型，支持高并发请求处理
+- analyze() 中的日志直接交给 StructuredLogger，其后台写线程负责文件 I/O，写日志文件不占用请求的关键路径
 """
+import os
 import time
 import uuid
 from typing import Dict, Any, Optional
@@ -48,6 +50,9 @@ class MultiAgentSystem:
         self.router = None             # 路由智能体实例
         self.experts = {}              # 专家智能体字典：{expert_type: OptimizedExpertAgent}
         self.is_initialized = False    # 系统初始化状态标志，防止未初始化就调用 analyze()
+        # 是否在控制台打印每次分析的进度（环境变量 MAS_VERBOSE，默认关闭）
+        # 服务端每次分析会打印十余行，同步写 stdout 会拉长请求尾延迟，仅建议本地调试时开启
+        self._verbose = os.getenv("MAS_VERBOSE", "false").lower() == "true"
     
     async def initialize(self) -> bool:
         """异步初始化系统
@@ -129,13 +134,14 @@ class MultiAgentSystem:
         if not self.is_initialized:
             raise RuntimeError("系统未初始化")
         
-        overall_start = time.time()
+        overall_start_ns = time.perf_counter_ns()
         # 为每次分析任务生成唯一的任务ID（UUID v4）
         task_id = str(uuid.uuid4())
         
-        print("\n" + "="*70)
-        print(f"开始分析告警...任务ID: {task_id}")
-        print("="*70)
+        if self._verbose:
+            print("\n" + "="*70)
+            print(f"开始分析告警...任务ID: {task_id}")
+            print("="*70)
         
         # 记录用户输入日志，包含任务ID、攻击类型和载荷预览（前100字符）
         self.logger.log("user_input", {
@@ -147,14 +153,17 @@ class MultiAgentSystem:
         
         # ==================== 阶段1：路由决策 ====================
         # 路由智能体分析告警文本，确定应由哪个专家处理
-        print("\n[阶段1] 路由决策中...")
+        if self._verbose:
+            print("\n[阶段1] 路由决策中...")
         routing_result = await self.router.route(alert_data)
         selected_route = routing_result['selected_route']
-        print(f" → 路由到: {selected_route} (置信度: {routing_result['confidence']:.2f})")
+        if self._verbose:
+            print(f" → 路由到: {selected_route} (置信度: {routing_result['confidence']:.2f})")
         
         # ==================== 阶段2：专家分析 ====================
         # 根据路由结果获取对应的专家智能体
-        print(f"\n[阶段2] 调用{selected_route}专家分析...")
+        if self._verbose:
+            print(f"\n[阶段2] 调用{selected_route}专家分析...")
         expert = self.experts.get(selected_route)
         if not expert:
             # 路由到了不存在的专家类型时，降级使用 web_attack 专家
@@ -162,12 +171,13 @@ class MultiAgentSystem:
         
         # 调用专家的异步分析方法，进行深度威胁分析
         expert_result = await expert.analyze(alert_data)
-        print(f"  → 分析完成: {expert_result.get('attack_technique', 'unknown')}")
-        print(f"  → 风险评分: {expert_result.get('risk_score', 0)}/10")
+        if self._verbose:
+            print(f"  → 分析完成: {expert_result.get('attack_technique', 'unknown')}")
+            print(f"  → 风险评分: {expert_result.get('risk_score', 0)}/10")
         
         # ==================== 阶段3：综合结果 ====================
         # 计算整体分析耗时
-        overall_time_ms = int((time.time() - overall_start) * 1000)
+        overall_time_ms = (time.perf_counter_ns() - overall_start_ns) // 1_000_000
         
         # 构建最终分析结果，整合路由信息、专家分析和性能指标
         final_result = {
@@ -201,9 +211,10 @@ class MultiAgentSystem:
             "total_processing_time_ms": overall_time_ms
         })
         
-        print("\n" + "="*70)
-        print(f"✓ 分析完成 (总耗时: {overall_time_ms}ms)")
-        print("="*70 + "\n")
+        if self._verbose:
+            print("\n" + "="*70)
+            print(f"✓ 分析完成 (总耗时: {overall_time_ms}ms)")
+            print("="*70 + "\n")
         
         return final_result
     
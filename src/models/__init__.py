@@ -1,5 +1,5 @@
 # Models module
 from .api_client import APIClient
-from .llm_inference import LLMInference, get_llm_inference
+from .llm_inference import LLMInference, get_llm_inference, close_llm_inference
 
-__all__ = ['APIClient', 'LLMInference', 'get_llm_inference']
+__all__ = ['APIClient', 'LLMInference', 'get_llm_inference', 'close_llm_inference']
@@ -5,15 +5,24 @@
 本模块封装了与 SiliconFlow/Qwen 远程 API 的 HTTP 通信逻辑。
 提供两个核心异步方法：
 1. generate(): 调用 Chat Completions API 生成文本（用于告警分析）
-2. get_embedding(): 调用 Embeddings API 生成文本向量（用于语义搜索等场景）
+2. get_embeddings() / get_embedding(): 调用 Embeddings API 批量/单条生成文本向量（用于语义搜索等场景）
 
 配置说明：
 - 所有 API 配置（API Key、模型名称、API 地址）均从 .env 环境变量读取
 - 使用 httpx 异步 HTTP 客户端，支持高效的非阻塞网络请求
-- 请求超时时间：文本生成 60 秒，向量生成 30 秒
+- 整个客户端共享一个 httpx.AsyncClient 连接池，各次请求复用已建立的 TCP/TLS 连接，
+  不再每次调用都重新握手；应用关闭时调用 close() 释放连接
+- 请求/响应体使用 orjson（Rust 实现）序列化和解析，替代 httpx 默认使用的标准库 json
+- 向量以 float32 的 numpy 数组返回，并请求 base64 编码的向量，直接从字节构建数组，
+  省去逐个解析和装箱上千个 JSON 浮点数
+- 请求超时时间：文本生成 60 秒，向量生成 30 秒（建立连接均为 10 秒）
 """
+import base64
 import os
+from typing import List
 import httpx
+import numpy as np
+import orjson
 from dotenv import load_dotenv
 
 # 加载项目根目录下的 .env 文件中的环境变量
@@ -55,6 +64,18 @@ class APIClient:
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json"
         }
+        
+        # 共享的异步 HTTP 客户端（连接池）
+        # 专家批量分析时会有多个 LLM 请求同时在途，保留足够的长连接供复用
+        self._client = httpx.AsyncClient(
+            headers=self.headers,
+            timeout=httpx.Timeout(60.0, connect=10.0),
+            limits=httpx.Limits(max_connections=64, max_keepalive_connections=32),
+        )
+    
+    async def close(self):
+        """关闭共享的 HTTP 连接池（应用关闭时调用）"""
+        await self._client.aclose()
     
     async def generate(self, prompt: str, max_tokens: int = 512, temperature: float = 0.7) -> str:
         """调用远程 LLM API 生成文本响应（异步方法）
@@ -87,49 +108,84 @@ class APIClient:
             "temperature": temperature
         }
         
-        # 使用 httpx 异步客户端发送 POST 请求
-        # timeout=60.0: 文本生成可能较慢，设置 60 秒超时
-        # async with 确保请求完成后自动关闭连接
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            response = await client.post(url, json=payload, headers=self.headers)
-            response.raise_for_status()  # 非 2xx 状态码时抛出异常
-            
-            # 从 API 响应中提取生成的文本内容
-            # 响应格式：{"choices": [{"message": {"content": "..."}}]}
-            result = response.json()
-            return result["choices"][0]["message"]["content"]
+        # 通过共享客户端发送 POST 请求（复用连接池中的连接）
+        # 文本生成可能较慢，使用客户端默认的 60 秒超时
+        # 请求体由 orjson 直接序列化为 bytes，Content-Type 已在共享请求头中声明
+        response = await self._client.post(url, content=orjson.dumps(payload))
+        response.raise_for_status()  # 非 2xx 状态码时抛出异常
+        
+        # 从 API 响应中提取生成的文本内容
+        # 响应格式：{"choices": [{"message": {"content": "..."}}]}
+        result = orjson.loads(response.content)
+        return result["choices"][0]["message"]["content"]
     
-    async def get_embedding(self, text: str) -> list:
-        """调用远程 API 获取文本的向量表示（异步方法）
+    async def get_embeddings(self, texts: List[str]) -> np.ndarray:
+        """调用远程 API 批量获取多段文本的向量表示（异步方法）
         
-        使用 OpenAI 兼容的 Embeddings API 格式，将文本转换为高维向量。
-        生成的向量可用于语义搜索、相似度计算等下游任务。
+        OpenAI 兼容的 Embeddings API 原生支持 "input" 传入文本数组，
+        一次 HTTP 请求即可完成整批文本的向量化，分摊网络往返开销。
         
         Args:
-            text: 需要向量化的文本内容
+            texts: 需要向量化的文本列表
             
         Returns:
-            list: 文本的向量表示（浮点数列表）
+            np.ndarray: 形状为 (len(texts), dim) 的 float32 向量矩阵，行顺序与 texts 一致
             
         Raises:
             httpx.HTTPStatusError: API 返回非 2xx 状态码时抛出
         """
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+        
         # 构建 Embeddings API 的请求 URL
         url = f"{self.base_url}/embeddings"
         
-        # 构建请求体
+        # 构建请求体：input 为文本数组
+        # encoding_format=base64：向量以小端 float32 字节的 base64 字符串返回（OpenAI 兼容格式）
         payload = {
             "model": self.embedding_model,
-            "input": text
+            "input": texts,
+            "encoding_format": "base64"
         }
         
-        # 使用 httpx 异步客户端发送 POST 请求
-        # timeout=30.0: 向量生成相对较快，30 秒超时即可
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.post(url, json=payload, headers=self.headers)
-            response.raise_for_status()
+        # 通过共享客户端发送 POST 请求
+        # 向量生成相对较快，单独设置 30 秒超时
+        response = await self._client.post(url, content=orjson.dumps(payload),
+                                           timeout=httpx.Timeout(30.0, connect=10.0))
+        response.raise_for_status()
+        
+        # 从 API 响应中提取向量数据
+        # 响应格式：{"data": [{"index": 0, "embedding": "<base64>"}, ...]}
+        # 按 index 排序，保证返回顺序与输入文本一致
+        result = orjson.loads(response.content)
+        data = sorted(result["data"], key=lambda item: item.get("index", 0))
+        return np.stack([self._decode_embedding(item["embedding"]) for item in data])
+    
+    @staticmethod
+    def _decode_embedding(embedding) -> np.ndarray:
+        """把 API 返回的单个向量转换为 float32 数组
+        
+        base64 字符串直接按 float32 字节解码；若服务端忽略 encoding_format
+        仍返回浮点数列表，则按列表转换。
+        """
+        if isinstance(embedding, str):
+            return np.frombuffer(base64.b64decode(embedding), dtype=np.float32)
+        return np.asarray(embedding, dtype=np.float32)
+    
+    async def get_embedding(self, text: str) -> np.ndarray:
+        """调用远程 API 获取文本的向量表示（异步方法）
+        
+        使用 OpenAI 兼容的 Embeddings API 格式，将文本转换为高维向量。
+        生成的向量可用于语义搜索、相似度计算等下游任务。
+        单条文本是 get_embeddings() 的特例，多条文本应直接调用批量接口。
+        
+        Args:
+            text: 需要向量化的文本内容
+            
+        Returns:
+            np.ndarray: 文本的向量表示（一维 float32 数组）
             
-            # 从 API 响应中提取向量数据
-            # 响应格式：{"data": [{"embedding": [0.1, 0.2, ...]}]}
-            result = response.json()
-            return result["data"][0]["embedding"]
+        Raises:
+            httpx.HTTPStatusError: API 返回非 2xx 状态码时抛出
+        """
+        return (await self.get_embeddings([text]))[0]
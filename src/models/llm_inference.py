@@ -15,6 +15,9 @@
 """
 import time
 import logging
+import threading
+from typing import List
+import numpy as np
 from src.models.api_client import APIClient
 
 # 标准库日志记录器，用于记录推理过程中的错误信息
@@ -24,15 +27,18 @@ logger = logging.getLogger(__name__)
 # 使用模块级全局变量实现 APIClient 的单例模式
 # _GLOBAL_CLIENT: 全局 APIClient 实例，所有 LLMInference 共享同一个客户端
 # _CLIENT_INITIALIZED: 标志位，确保 APIClient 只被初始化一次
+# _CLIENT_LOCK: 保护首次初始化，多个线程同时创建 LLMInference 时只会创建一个 APIClient
+#               （初始化完成后的读取走无锁快速路径）
 _GLOBAL_CLIENT = None
 _CLIENT_INITIALIZED = False
+_CLIENT_LOCK = threading.Lock()
 
 class LLMInference:
     """远程模型推理引擎包装器（异步版本）
     
     封装 APIClient，提供面向业务的推理接口：
     - generate_response(): 文本生成（用于安全威胁分析）
-    - get_embedding(): 向量生成（用于语义搜索）
+    - get_embedding() / get_embeddings(): 单条/批量向量生成（用于语义搜索）
     
     单例行为说明：
     - 首次创建时初始化 APIClient 并缓存到全局变量
@@ -51,31 +57,38 @@ class LLMInference:
         """
         global _GLOBAL_CLIENT, _CLIENT_INITIALIZED
 
-        # 如果 APIClient 已经初始化过，直接复用全局实例
+        # 快速路径：APIClient 已经初始化过，无需加锁，直接复用全局实例
         if _CLIENT_INITIALIZED:
             print("[正常] 使用已初始化的API客户端")
             self.client = _GLOBAL_CLIENT
             return
 
-        # 首次初始化：创建 APIClient 实例
-        print("\n" + "="*70)
-        print("[启动] 初始化异步远程API客户端")
-        print("="*70)
+        # 首次初始化：加锁保证只有一个线程创建 APIClient
+        with _CLIENT_LOCK:
+            # 双重检查：等待锁期间其他线程可能已经完成初始化
+            if _CLIENT_INITIALIZED:
+                self.client = _GLOBAL_CLIENT
+                return
 
-        try:
-            # 创建 APIClient 实例（会读取 .env 中的 API Key 和模型配置）
-            self.client = APIClient()
-            _GLOBAL_CLIENT = self.client          # 缓存到全局变量
-            _CLIENT_INITIALIZED = True            # 标记为已初始化
-            
-            print("      [正常] 异步API客户端已初始化")
+            # 首次初始化：创建 APIClient 实例
+            print("\n" + "="*70)
+            print("[启动] 初始化异步远程API客户端")
             print("="*70)
-            print("[成功] 系统已就绪，可进行异步远程推理！")
-            print("="*70 + "\n")
 
-        except Exception as e:
-            print(f"[错误] API客户端初始化失败: {e}")
-            raise RuntimeError(f"API Client initialization failed: {e}")
+            try:
+                # 创建 APIClient 实例（会读取 .env 中的 API Key 和模型配置）
+                self.client = APIClient()
+                _GLOBAL_CLIENT = self.client          # 缓存到全局变量
+                _CLIENT_INITIALIZED = True            # 标记为已初始化
+            
+                print("      [正常] 异步API客户端已初始化")
+                print("="*70)
+                print("[成功] 系统已就绪，可进行异步远程推理！")
+                print("="*70 + "\n")
+
+            except Exception as e:
+                print(f"[错误] API客户端初始化失败: {e}")
+                raise RuntimeError(f"API Client initialization failed: {e}")
 
     async def generate_response(self, prompt: str, max_new_tokens: int = 512, temperature: float = 0.7) -> str:
         """调用远程 LLM 生成文本响应（异步方法）
@@ -119,7 +132,34 @@ class LLMInference:
             logger.error(f"Async inference failed: {e}")
             raise  # 将异常向上抛出，由专家智能体的 analyze() 方法处理降级
     
-    async def get_embedding(self, text: str) -> list:
+    async def get_embeddings(self, texts: List[str]) -> np.ndarray:
+        """批量获取多段文本的向量表示（异步方法）
+        
+        整批文本通过一次 API 请求完成向量化，需要向量化多段文本时应优先使用本方法。
+        
+        Args:
+            texts: 需要向量化的文本列表
+            
+        Returns:
+            np.ndarray: 形状为 (len(texts), dim) 的 float32 向量矩阵
+            
+        Raises:
+            RuntimeError: APIClient 未初始化时抛出
+        """
+        global _CLIENT_INITIALIZED
+        
+        # 前置检查
+        if not _CLIENT_INITIALIZED or self.client is None:
+            raise RuntimeError("API Client not initialized!")
+        
+        try:
+            # 调用底层 APIClient 的 get_embeddings() 方法
+            return await self.client.get_embeddings(texts)
+        except Exception as e:
+            logger.error(f"Async batch embedding generation failed: {e}")
+            raise
+    
+    async def get_embedding(self, text: str) -> np.ndarray:
         """获取文本的向量表示（异步方法）
         
         将文本转换为高维向量，可用于语义搜索和相似度计算。
@@ -128,7 +168,7 @@ class LLMInference:
             text: 需要向量化的文本
             
         Returns:
-            list: 文本向量（浮点数列表）
+            np.ndarray: 文本向量（一维 float32 数组）
             
         Raises:
             RuntimeError: APIClient 未初始化时抛出
@@ -150,7 +190,9 @@ class LLMInference:
 
 # ==================== 全局实例工厂函数 ====================
 # 进一步的单例封装：确保整个应用中只存在一个 LLMInference 实例
+# _llm_instance_lock: 双重检查锁，已创建后的调用只读取一次全局变量，不加锁
 _llm_instance = None
+_llm_instance_lock = threading.Lock()
 
 def get_llm_inference():
     """获取全局 LLM 推理实例（工厂函数 + 单例模式）
@@ -158,14 +200,28 @@ def get_llm_inference():
     整个系统共享同一个 LLMInference 实例，避免重复创建：
     - 首次调用：创建 LLMInference 实例（内部会初始化 APIClient）
     - 后续调用：直接返回已缓存的实例
+    - 多线程并发首次调用时由锁保证只创建一个实例
     
     Returns:
         LLMInference: 全局唯一的 LLM 推理引擎实例
     """
     global _llm_instance
-    if _llm_instance is None:
-        _llm_instance = LLMInference()
-    return _llm_instance
+    instance = _llm_instance
+    if instance is None:
+        with _llm_instance_lock:
+            if _llm_instance is None:
+                _llm_instance = LLMInference()
+            instance = _llm_instance
+    return instance
+
+
+async def close_llm_inference():
+    """关闭全局 APIClient 的 HTTP 连接池（应用关闭时调用）
+
+    APIClient 在整个进程内共享一个 httpx.AsyncClient，关闭后不可再发起请求。
+    """
+    if _GLOBAL_CLIENT is not None:
+        await _GLOBAL_CLIENT.close()
 
 
 # ==================== 测试入口 ====================
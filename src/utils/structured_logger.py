@@ -5,8 +5,11 @@
 本模块提供 JSON 格式的结构化日志系统，用于追踪多智能体系统的完整处理链路。
 
 核心功能：
-1. 实时日志写入：每条日志立即追加到本地 JSONL 文件，确保异常退出时不丢失数据
-2. 内存日志副本：在内存中保留所有日志条目，支持快速查询和统计
+1. 日志写入：每条日志追加到本地 JSONL 文件。log() 只把编码好的日志行放入队列，
+   由专门的后台写线程持有以 O_APPEND 打开的文件描述符，把队列中积压的日志行合并为一次 write() 批量写入，
+   磁盘 I/O 不占用调用方（处理请求的）线程；保存会话摘要和进程退出时强制刷新
+2. 内存日志副本：在内存中保留最近的日志条目（有界环形缓冲区），长时间运行的会话内存占用不随日志量增长；
+   完整日志始终在 JSONL 文件中
 3. 性能统计：自动统计总 token 消耗、总处理时间、各阶段调用次数和耗时
 4. 会话摘要：支持生成完整的会话统计摘要文件
 
@@ -19,56 +22,116 @@
 - user_input: 用户提交的告警数据
 - router_decision: 路由智能体的决策结果
 - llm_inference: LLM 调用性能数据
+- llm_retry: LLM 调用遇到暂时性错误，退避后重试
 - llm_inference_error: LLM 调用失败记录
+- llm_cache_hit: 专家分析命中 LLM 响应缓存
 - expert_analysis: 专家分析完成记录
 - final_result: 最终分析结果
 - session_end: 日志会话结束
 """
-import json
+import atexit
+import os
+import queue
+import sys
+import threading
 import time
+from collections import defaultdict, deque
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 
+import orjson
+
+# orjson 序列化选项：直接在输出末尾追加换行符（JSONL 的行分隔），
+# 并与标准库 json 一样允许非字符串类型的字典键
+_JSONL_OPTIONS = orjson.OPT_APPEND_NEWLINE | orjson.OPT_NON_STR_KEYS
+# 写线程退出标记：放入队列后，写线程写完此前的所有日志行即退出
+_STOP = object()
+
+# 落盘同步函数：优先使用 fdatasync（只同步数据和文件长度，跳过修改时间等元数据），
+# 不支持的平台（如 macOS）退回 fsync
+_sync_file = getattr(os, "fdatasync", os.fsync)
 
 class StructuredLogger:
     """结构化日志记录器 - 实时写入本地文件
     
     每次创建新实例（即新的分析会话）时，会自动创建一个以时间戳命名的日志文件。
-    所有日志条目同时保存在内存（log_entries 列表）和磁盘（JSONL 文件）中。
+    所有日志条目写入磁盘（JSONL 文件），内存中（log_entries）只保留最近 RECENT_ENTRIES_MAX 条。
     """
     
-    def __init__(self, log_dir: str = "logs"):
+    # 写线程单次合并写入的数据量上限（字节）
+    WRITE_BATCH_MAX = 128 * 1024
+    # 内存中保留的最近日志条数
+    RECENT_ENTRIES_MAX = 1024
+    
+    def __init__(self, log_dir: str = "logs", verbose: Optional[bool] = None):
         """初始化日志记录器
         
         Args:
             log_dir: 日志文件存储目录（默认为项目根目录下的 "logs" 文件夹）
+            verbose: 是否在控制台回显每条 INFO 日志；默认读取环境变量 MAS_VERBOSE（默认关闭）
         """
+        # 控制台回显开关：关闭时 INFO 日志只写文件，省去一次序列化和一次 stdout 写入；
+        # WARN / ERROR 等非 INFO 日志始终回显
+        if verbose is None:
+            verbose = os.getenv("MAS_VERBOSE", "false").lower() == "true"
+        self.verbose = verbose
+        
         # 创建日志目录（如果不存在）
         self.log_dir = Path(log_dir)
         self.log_dir.mkdir(exist_ok=True)       # exist_ok=True: 目录已存在时不报错
         
         # 生成日志文件路径：logs/analysis_YYYYMMDD_HHMMSS.jsonl
         # 使用精确到秒的时间戳确保每次会话的日志文件唯一
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        start_wall = datetime.now()
+        timestamp = start_wall.strftime("%Y%m%d_%H%M%S")
         self.log_file = self.log_dir / f"analysis_{timestamp}.jsonl"
+        # 路径字符串和摘要文件路径在会话内不变，创建时计算一次
+        # 摘要文件路径：将 .jsonl 后缀替换为 .summary.json
+        self._log_file_str = str(self.log_file)
+        self._summary_file = self.log_file.with_suffix(".summary.json")
         
-        # 内存中的日志条目列表，保存所有日志的副本
-        # 用途：快速统计查询，不需要从磁盘读取
-        self.log_entries = []
+        # 整个会话复用同一个文件描述符，避免每条日志都 open()/write()/close() 一次。
+        # 以 O_APPEND 打开：每次 write() 由内核原子地定位到文件末尾再写入，
+        # 多个进程（如 uvicorn 多 worker 同一秒启动）共用同一日志文件时也不会互相覆盖，无需用户态文件锁。
+        # 批量合并由写线程完成，每批日志直接一次 os.write()
+        self._fd = os.open(self._log_file_str, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        # 待写入队列：元素为编码好的日志行（bytes）、刷新屏障（threading.Event）或退出标记 _STOP
+        self._queue: "queue.SimpleQueue" = queue.SimpleQueue()
+        # 后台写线程：唯一持有并写入文件句柄的线程
+        self._writer = threading.Thread(target=self._writer_loop, name="structured-logger-writer", daemon=True)
+        self._writer.start()
+        # 进程退出时自动刷新并关闭
+        atexit.register(self.close)
         
-        # 累积统计信息字典
-        self.stats = {
-            "total_tokens": 0,      # 累积消耗的 token 总数（输入 + 输出）
-            "total_time_ms": 0,     # 累积处理时间（毫秒）
-            "stages": {}            # 各阶段的统计：{stage_name: {count, total_time_ms}}
-        }
+        # 内存中最近的日志条目（超出 RECENT_ENTRIES_MAX 时自动丢弃最旧的条目）
+        # 用途：快速查询最近日志，不需要从磁盘读取；会话摘要只依赖下面的累积统计，不需要全部条目
+        self.log_entries: "deque[Dict[str, Any]]" = deque(maxlen=self.RECENT_ENTRIES_MAX)
+        # 本次会话的日志总条数
+        self._entry_count = 0
+        
+        # 时间戳基准：会话开始时读取一次墙上时间，之后每条日志只读单调时钟计算偏移，
+        # 不再每条日志都 datetime.now().isoformat()
+        self._t0_mono_ns = time.monotonic_ns()
+        self._t0_wall_us = int(start_wall.timestamp()) * 1_000_000 + start_wall.microsecond
+        # 秒级前缀缓存 (秒, "YYYY-MM-DDTHH:MM:SS")：同一秒内的日志只拼接微秒部分
+        self._ts_second_cache = (None, "")
+        
+        # 累积统计计数器（扁平存储，每条日志只做少量加法；需要时由 stats 属性组装成嵌套字典）
+        self._total_tokens = 0      # 累积消耗的 token 总数（输入 + 输出）
+        self._total_time_ms = 0     # 累积处理时间（毫秒）
+        # 各阶段的统计：{stage_name: [count, total_time_ms]}
+        self._stage_stats: Dict[str, List[float]] = defaultdict(lambda: [0, 0])
+        # 统计版本号：每条日志更新计数器后加一；统计快照 (版本号, 字典) 只在版本变化后才重新组装
+        self._stats_version = 0
+        self._stats_snapshot: tuple = (-1, None)
 
         # 写入会话开始标记，标志一个新的分析会话
+        self._session_start = self._timestamp()
         self._append_to_file({
             "event": "session_start",
-            "timestamp": datetime.now().isoformat(),
-            "log_file": str(self.log_file)
+            "timestamp": self._session_start,
+            "log_file": self._log_file_str
         })
     
     def log(self, stage: str, data: Dict[str, Any], level: str = "INFO"):
@@ -86,54 +149,63 @@ class StructuredLogger:
         # 构建日志条目：时间戳 + 级别 + 阶段 + 阶段数据
         # 使用 **data 展开操作符将阶段数据平铺到日志条目中
         entry = {
-            "timestamp": datetime.now().isoformat(),
+            "timestamp": self._timestamp(),
             "level": level,
             "stage": stage,
             **data                  # 将 data 字典中的所有键值对展开到 entry 中
         }
         
-        # 同时保存到内存列表
+        # 同时保存到内存中的最近日志
         self.log_entries.append(entry)
+        self._entry_count += 1
         
-        # ===== 实时追加写入本地 JSONL 文件 =====
-        # 每条日志立即写入磁盘，确保即使程序异常终止也不会丢失日志
+        # ===== 追加写入本地 JSONL 文件（经由写缓冲区） =====
         self._append_to_file(entry)
         
         # ===== 更新累积统计信息 =====
         
-        # 累加处理时间
-        if "processing_time_ms" in data:
-            self.stats["total_time_ms"] += data["processing_time_ms"]
+        # 累加处理时间和 token 消耗量（输入 + 输出）
+        elapsed_ms = data.get("processing_time_ms", 0)
+        self._total_time_ms += elapsed_ms
+        self._total_tokens += data.get("input_tokens", 0) + data.get("output_tokens", 0)
         
-        # 累加 token 消耗量（分别统计输入和输出 token）
-        if "input_tokens" in data:
-            self.stats["total_tokens"] += data.get("input_tokens", 0)
-        if "output_tokens" in data:
-            self.stats["total_tokens"] += data.get("output_tokens", 0)
-            
         # 按阶段分组统计：记录每个阶段的调用次数和累积耗时
-        if stage not in self.stats["stages"]:
-            self.stats["stages"][stage] = {"count": 0, "total_time_ms": 0}
-        self.stats["stages"][stage]["count"] += 1
-        if "processing_time_ms" in data:
-            self.stats["stages"][stage]["total_time_ms"] += data["processing_time_ms"]
+        stage_stats = self._stage_stats[stage]
+        stage_stats[0] += 1
+        stage_stats[1] += elapsed_ms
+        self._stats_version += 1
         
-        # 控制台实时输出日志（方便开发调试）
-        # ensure_ascii=False 确保中文字符正常显示
-        print(f"[{level}] {stage}: {json.dumps(data, ensure_ascii=False)}")
+        # 控制台实时输出日志（方便开发调试）：INFO 日志仅在 verbose 模式下回显
+        # orjson 直接输出 UTF-8，中文字符原样显示
+        if self.verbose or level != "INFO":
+            sys.stdout.write(f"[{level}] {stage}: {orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS).decode()}\n")
+    
+    def _timestamp(self) -> str:
+        """生成当前时刻的 ISO 8601 时间戳（本地时间，精确到微秒）
+        
+        由会话开始的墙上时间加上单调时钟偏移得到；秒级部分每秒只格式化一次，
+        格式与 datetime.isoformat() 相同（固定带微秒）。
+        """
+        now_us = self._t0_wall_us + (time.monotonic_ns() - self._t0_mono_ns) // 1000
+        second, micro = divmod(now_us, 1_000_000)
+        cached_second, prefix = self._ts_second_cache
+        if second != cached_second:
+            prefix = datetime.fromtimestamp(second).strftime("%Y-%m-%dT%H:%M:%S")
+            self._ts_second_cache = (second, prefix)
+        return f"{prefix}.{micro:06d}"
     
     def _append_to_file(self, entry: Dict[str, Any]):
         """追加一条 JSON 行到日志文件（JSONL 格式）
         
         JSONL（JSON Lines）格式：每行一个独立的 JSON 对象，便于逐行读取和流式处理。
-        使用 "a"（append）模式打开文件，确保新日志追加到文件末尾。
+        这里只负责用 orjson 编码（一次得到带换行的 UTF-8 字节）并放入队列（不阻塞），
+        实际写入由后台写线程完成。
         
         Args:
             entry: 要写入的日志条目字典
         """
         try:
-            with open(self.log_file, "a", encoding="utf-8") as f:
-                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self._queue.put(orjson.dumps(entry, option=_JSONL_OPTIONS))
         except Exception as e:
             # 日志写入失败不应影响主业务流程，仅打印警告
             print(f"[WARN] 日志写入失败: {e}")
@@ -148,48 +220,167 @@ class StructuredLogger:
         Returns:
             str: 主日志文件的路径
         """
-        # 生成摘要文件路径：将 .jsonl 后缀替换为 .summary.json
-        summary_file = self.log_file.with_suffix(".summary.json")
-        
         # 构建会话摘要
+        stats = self.stats
         output = {
-            "session_start": self.log_entries[0]["timestamp"] if self.log_entries else None,
-            "session_end": datetime.now().isoformat(),
-            "total_entries": len(self.log_entries),     # 本次会话的日志总条数
-            "statistics": self.stats,                   # 累积统计信息
-            "log_file": str(self.log_file)              # 主日志文件路径
+            "session_start": self._session_start,
+            "session_end": self._timestamp(),
+            "total_entries": self._entry_count,         # 本次会话的日志总条数
+            "statistics": stats,                        # 累积统计信息
+            "log_file": self._log_file_str              # 主日志文件路径
         }
         
         # 写入摘要文件（格式化 JSON，便于人工阅读）
-        with open(summary_file, "w", encoding="utf-8") as f:
-            json.dump(output, f, ensure_ascii=False, indent=2)
+        # orjson 一次生成完整的 UTF-8 字节，整个文件只需一次 write()
+        with open(self._summary_file, "wb") as f:
+            f.write(orjson.dumps(output, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
         
         # 在主日志文件中写入会话结束标记
         self._append_to_file({
             "event": "session_end",
-            "timestamp": datetime.now().isoformat(),
-            "total_entries": len(self.log_entries),
-            "statistics": self.stats
+            "timestamp": self._timestamp(),
+            "total_entries": self._entry_count,
+            "statistics": stats
         })
         
-        print(f"\n日志已保存到: {self.log_file}")
-        print(f"会话摘要: {summary_file}")
-        return str(self.log_file)
+        # 等待队列中的日志全部写入文件，并确保落盘
+        # （只等待写完，不停止写线程：保存摘要后本会话仍可继续记录日志）
+        # 整个会话只在这里同步一次磁盘，平时的日志写入不做同步；
+        # 进程在 save() 之前崩溃时可能丢失最后一批尚未落盘的日志（此时摘要也尚未生成）
+        self.flush()
+        try:
+            _sync_file(self._fd)
+        except OSError as e:
+            print(f"[WARN] 日志同步到磁盘失败: {e}")
+        
+        print(f"\n日志已保存到: {self._log_file_str}")
+        print(f"会话摘要: {self._summary_file}")
+        return self._log_file_str
+    
+    def _writer_loop(self):
+        """后台写线程主循环
+        
+        阻塞等待第一条日志，再非阻塞地取出队列中已积压的日志行（不超过 WRITE_BATCH_MAX），
+        合并为一次 write() 写入文件；刷新屏障在其之前的日志写完后置位，收到退出标记时写完剩余日志后退出。
+        """
+        while True:
+            batch: List[bytes] = []
+            batch_size = 0
+            barriers: List[threading.Event] = []
+            stop = False
+            item = self._queue.get()
+            while True:
+                if item is _STOP:
+                    stop = True
+                    break
+                if isinstance(item, threading.Event):
+                    barriers.append(item)
+                else:
+                    batch.append(item)
+                    batch_size += len(item)
+                    if batch_size >= self.WRITE_BATCH_MAX:
+                        break
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            if batch:
+                self._write_batch(batch)
+            for barrier in barriers:
+                barrier.set()
+            if stop:
+                return
+    
+    def _write_batch(self, batch: List[bytes]):
+        """把一批日志行合并后写入文件（仅在写线程中调用）
+        
+        整批日志在内存中拼成一个完整的 bytes 后再写入，配合 O_APPEND 保证整批追加；
+        os.write() 可能只写入一部分数据，因此循环写到全部完成。
+        """
+        try:
+            data = b"".join(batch)
+            offset = 0
+            with memoryview(data) as view:
+                while offset < len(view):
+                    with view[offset:] as chunk:
+                        offset += os.write(self._fd, chunk)
+        except Exception as e:
+            # 日志写入失败不应影响主业务流程，仅打印警告
+            print(f"[WARN] 日志写入失败: {e}")
+    
+    def flush(self):
+        """等待队列中已提交的日志全部写入文件（保存会话、关闭时调用）"""
+        if not self._writer.is_alive():
+            return
+        barrier = threading.Event()
+        self._queue.put(barrier)
+        barrier.wait()
+    
+    def close(self):
+        """写完剩余日志，停止写线程并关闭文件句柄（重置日志记录器或进程退出时调用）"""
+        if self._writer.is_alive():
+            self._queue.put(_STOP)
+            self._writer.join()
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+        atexit.unregister(self.close)
+    
+    def get_recent(self, n: int = 100) -> List[Dict[str, Any]]:
+        """获取最近的 n 条日志（按时间顺序，最多 RECENT_ENTRIES_MAX 条）
+        
+        Args:
+            n: 返回的条数
+        
+        Returns:
+            list: 日志条目列表
+        """
+        if n <= 0:
+            return []
+        return list(self.log_entries)[-n:]
+    
+    @property
+    def stats(self) -> Dict[str, Any]:
+        """由扁平计数器组装的累积统计信息快照
+        
+        两次日志之间的多次访问（如前端轮询统计接口）复用同一个快照，不再重复组装；
+        快照与内部计数器相互独立，但会被后续调用共享，调用方应只读、不要修改。
+        组装前先读取版本号：组装期间若有新日志写入，版本号已变化，下次访问会重新组装。
+        
+        Returns:
+            dict: {total_tokens, total_time_ms, stages: {stage_name: {count, total_time_ms}}}
+        """
+        version = self._stats_version
+        snapshot_version, snapshot = self._stats_snapshot
+        if snapshot_version != version:
+            snapshot = {
+                "total_tokens": self._total_tokens,
+                "total_time_ms": self._total_time_ms,
+                "stages": {
+                    stage: {"count": count, "total_time_ms": total_time_ms}
+                    for stage, (count, total_time_ms) in list(self._stage_stats.items())
+                }
+            }
+            self._stats_snapshot = (version, snapshot)
+        return snapshot
     
     def get_stats(self) -> Dict[str, Any]:
         """获取当前会话的累积统计信息
         
-        返回统计信息的副本（深拷贝），防止外部修改影响内部状态。
+        返回只读快照：统计未变化时直接返回上次的快照，不复制字典（调用方不要修改返回值）。
         
         Returns:
             dict: 统计信息字典，包含 total_tokens, total_time_ms, stages 等
         """
-        return self.stats.copy()
+        return self.stats
 
 
 # ==================== 全局日志实例管理 ====================
 # 使用模块级全局变量实现日志记录器的单例模式
+# _global_logger_lock: 双重检查锁，已创建后的调用只读取一次全局变量，不加锁；
+# 多线程并发首次调用时只创建一个实例（重复创建会多打开一个日志文件和写线程）
 _global_logger: Optional[StructuredLogger] = None
+_global_logger_lock = threading.Lock()
 
 def get_logger() -> StructuredLogger:
     """获取全局日志记录器实例（惰性初始化）
@@ -201,9 +392,13 @@ def get_logger() -> StructuredLogger:
         StructuredLogger: 全局唯一的日志记录器实例
     """
     global _global_logger
-    if _global_logger is None:
-        _global_logger = StructuredLogger()
-    return _global_logger
+    logger = _global_logger
+    if logger is None:
+        with _global_logger_lock:
+            if _global_logger is None:
+                _global_logger = StructuredLogger()
+            logger = _global_logger
+    return logger
 
 def reset_logger():
     """重置全局日志记录器（用于新的分析会话）
@@ -215,5 +410,11 @@ def reset_logger():
         StructuredLogger: 新创建的全局日志记录器实例
     """
     global _global_logger
-    _global_logger = StructuredLogger()
-    return _global_logger
+    with _global_logger_lock:
+        old_logger = _global_logger
+        _global_logger = StructuredLogger()
+        new_logger = _global_logger
+    if old_logger is not None:
+        # 旧会话的文件句柄不再使用，写完队列中的日志后关闭（在锁外等待写线程退出）
+        old_logger.close()
+    return new_logger
@@ -25,23 +25,26 @@ sys.path.insert(0, project_root)
 
 if __name__ == "__main__":
     import uvicorn
-    from backend.config import BackendConfig
+    from backend.config import CONFIG
     
     # 打印启动信息横幅
     print("=" * 60)
     print("🚀 启动多智能体安全分析系统后端服务")
     print("=" * 60)
-    print(f"📍 地址: http://{BackendConfig.API_HOST}:{BackendConfig.API_PORT}")
-    print(f"📚 API文档: http://{BackendConfig.API_HOST}:{BackendConfig.API_PORT}/docs")
-    print(f"🏥 健康检查: http://{BackendConfig.API_HOST}:{BackendConfig.API_PORT}/api/health")
+    print(f"📍 地址: http://{CONFIG.API_HOST}:{CONFIG.API_PORT}")
+    print(f"📚 API文档: http://{CONFIG.API_HOST}:{CONFIG.API_PORT}/docs")
+    print(f"🏥 健康检查: http://{CONFIG.API_HOST}:{CONFIG.API_PORT}/api/health")
     print("=" * 60)
     
     # 使用 uvicorn（ASGI 服务器）启动 FastAPI 应用
     # "backend.main:app" 指定模块路径和应用实例名（backend/main.py 中的 app 变量）
     uvicorn.run(
         "backend.main:app",                         # ASGI 应用入口点
-        host=BackendConfig.API_HOST,                 # 监听地址
-        port=BackendConfig.API_PORT,                 # 监听端口
-        reload=BackendConfig.API_RELOAD,             # 热重载：代码修改后自动重启（开发模式）
-        log_level=BackendConfig.LOG_LEVEL.lower()    # 日志级别
+        host=CONFIG.API_HOST,                        # 监听地址
+        port=CONFIG.API_PORT,                        # 监听端口
+        reload=CONFIG.API_RELOAD,                    # 热重载：代码修改后自动重启（开发模式，ENV=production 时强制关闭）
+        workers=CONFIG.API_WORKERS,                  # worker 进程数（默认 1）
+        loop=CONFIG.API_LOOP,                        # 事件循环实现（默认 uvloop）
+        http=CONFIG.API_HTTP,                        # HTTP 解析器（默认 httptools）
+        log_level=CONFIG.LOG_LEVEL.lower()           # 日志级别
     )
@@ -8,7 +8,7 @@
 主要功能：
 1. 将项目根目录添加到 Python 路径
 2. 打印启动提示信息
-3. 使用 subprocess 调用 streamlit run 命令启动 Streamlit 应用
+3. 用 streamlit run 命令替换当前进程（os.execv）启动 Streamlit 应用
 
 注意事项：
 - 启动前请确保后端服务已运行（python start_backend.py）
@@ -17,7 +17,6 @@
 """
 import sys
 import os
-import subprocess
 
 # 将项目根目录添加到 Python 的模块搜索路径
 project_root = os.path.dirname(os.path.abspath(__file__))
@@ -35,12 +34,12 @@ if __name__ == "__main__":
     # 构建 Streamlit 入口文件的绝对路径
     frontend_app = os.path.join(project_root, "frontend", "app.py")
     
-    # 使用 subprocess 启动 Streamlit 应用
+    # 构建 streamlit run 命令
     # sys.executable 确保使用当前 Python 解释器运行 streamlit 模块
     # -m streamlit run: 以模块方式运行 streamlit
     # --server.port=8501: 指定服务端口
     # --server.address=localhost: 仅监听本地连接
-    subprocess.run([
+    cmd = [
         sys.executable,
         "-m",
         "streamlit",
@@ -48,4 +47,18 @@ if __name__ == "__main__":
         frontend_app,
         "--server.port=8501",
         "--server.address=localhost"
-    ])
+    ]
+    # 生产环境关闭 Streamlit 的源码文件监视（与后端 ENV=production 关闭热重载一致）
+    if os.getenv("ENV", "development").lower() == "production":
+        cmd.append("--server.fileWatcherType=none")
+    
+    if sys.platform == "win32":
+        # Windows 的 exec 系列函数实际是新建进程后退出当前进程，控制台行为异常，仍使用子进程方式
+        import subprocess
+        subprocess.run(cmd)
+    else:
+        # 用 Streamlit 进程直接替换当前进程：不再多驻留一个仅用于等待子进程的 Python 解释器，
+        # 信号（如 Ctrl+C、supervisor 停止）也直接送达 Streamlit
+        # exec 前先刷新标准输出，避免上面的启动信息在管道输出时丢失
+        sys.stdout.flush()
+        os.execv(sys.executable, cmd)